@@ -0,0 +1,248 @@
+"""
+Benchmarks for the conversation context engine
+
+Usage:
+    python benchmarks/bench_context.py --sizes 100,1000,5000 --output bench.json
+    python benchmarks/bench_context.py --baseline bench.json --max-regression 0.25
+
+Synthetic channel histories are generated deterministically from --seed, and
+every operation is measured with encryption off and on. Results are emitted as
+JSON; with --baseline the run exits non-zero if any median regressed by more
+than --max-regression.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import copy
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from context_manager import (  # noqa: E402
+    ContextManager,
+    ConversationContext,
+    ConversationMessage,
+)
+from context_tools import ContextTools  # noqa: E402
+
+WORDS = (
+    "okapi giraffe forest deploy latency cache shard token prompt message "
+    "channel history search summary python discord mistral encrypt budget "
+    "yesterday meeting release bug fix review question answer idea plan"
+).split()
+AUTHORS = ["alice", "bob", "carol", "dave", "erin", "frank"]
+
+
+def generate_context(channel_id: str, size: int, seed: int) -> ConversationContext:
+    rng = random.Random(seed + size)
+    now = time.time()
+    start = now - 7 * 24 * 3600
+    step = (now - start) / max(1, size)
+    messages = []
+    for i in range(size):
+        is_bot = rng.random() < 0.4
+        content = " ".join(rng.choices(WORDS, k=rng.randint(4, 120)))
+        messages.append(
+            ConversationMessage(
+                id=str(10_000_000 + i),
+                author_id="bot" if is_bot else str(rng.randint(1, len(AUTHORS))),
+                author_name="Okapi" if is_bot else rng.choice(AUTHORS),
+                content=content,
+                timestamp=start + i * step,
+                role="assistant" if is_bot else "user",
+                is_bot=is_bot,
+                token_count=max(1, len(content) // 4),
+            )
+        )
+    return ConversationContext(
+        channel_id=channel_id,
+        messages=messages,
+        created_at=start,
+        last_activity=now,
+        total_tokens=sum(msg.token_count for msg in messages),
+    )
+
+
+def _summarize(samples_ns: list[int]) -> dict[str, float]:
+    ordered = sorted(samples_ns)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] / 1e6,
+        "median_ms": statistics.median(ordered) / 1e6,
+        "mean_ms": statistics.fmean(ordered) / 1e6,
+        "p95_ms": p95 / 1e6,
+    }
+
+
+async def _measure(
+    repeat: int,
+    setup: Callable[[], Any],
+    operation: Callable[[Any], Awaitable[Any] | Any],
+) -> dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        state = setup()
+        started = time.perf_counter_ns()
+        result = operation(state)
+        if asyncio.iscoroutine(result):
+            await result
+        samples.append(time.perf_counter_ns() - started)
+    return _summarize(samples)
+
+
+async def run_suite(sizes: list[int], repeat: int, seed: int) -> list[dict[str, Any]]:
+    results = []
+    key = base64.b64encode(os.urandom(32)).decode("ascii")
+
+    for encrypted in (False, True):
+        for size in sizes:
+            base = generate_context("bench", size, seed)
+            data = base.to_dict()
+
+            with tempfile.TemporaryDirectory() as tmp:
+                manager = ContextManager(tmp, encryption_key=key if encrypted else None)
+                tools = ContextTools(manager)
+                extra = ConversationMessage(
+                    id="extra",
+                    author_id="1",
+                    author_name="alice",
+                    content=" ".join(WORDS[:40]),
+                    timestamp=time.time(),
+                    role="user",
+                    is_bot=False,
+                    token_count=60,
+                )
+                budget = max(1, base.total_tokens // 2)
+
+                def fresh():
+                    return copy.deepcopy(base)
+
+                async def save(context):
+                    await manager._save_context(context)
+
+                async def load(_):
+                    manager.active_contexts.pop("bench")
+                    await manager._load_context("bench")
+
+                async def search(_):
+                    await tools._search_conversation_history(
+                        "bench", {"keywords": ["latency", "release"], "limit": 15}
+                    )
+
+                await manager._save_context(base)
+                manager.active_contexts.put("bench", base)
+
+                operations = {
+                    "add_message": (fresh, lambda c: c.add_message(extra)),
+                    "prune_messages": (fresh, lambda c: c.prune_messages(budget)),
+                    "to_dict": (lambda: base, lambda c: c.to_dict()),
+                    "from_dict": (
+                        lambda: data,
+                        lambda d: ConversationContext.from_dict(d),
+                    ),
+                    "save_context": (lambda: base, save),
+                    "load_context": (lambda: None, load),
+                    "search_conversation_history": (lambda: None, search),
+                }
+                for name, (setup, operation) in operations.items():
+                    stats = await _measure(repeat, setup, operation)
+                    results.append(
+                        {
+                            "operation": name,
+                            "messages": size,
+                            "encrypted": encrypted,
+                            **stats,
+                        }
+                    )
+                    print(
+                        f"{name:<28} n={size:<6} enc={str(encrypted):<5} "
+                        f"median={stats['median_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms",
+                        file=sys.stderr,
+                    )
+                manager.shutdown()
+    return results
+
+
+def _result_key(result: dict[str, Any]) -> tuple:
+    return (result["operation"], result["messages"], result["encrypted"])
+
+
+def compare(
+    results: list[dict[str, Any]], baseline: list[dict[str, Any]], threshold: float
+) -> list[str]:
+    previous = {_result_key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(_result_key(result))
+        if not before or before["median_ms"] <= 0:
+            continue
+        change = result["median_ms"] / before["median_ms"] - 1
+        result["baseline_median_ms"] = before["median_ms"]
+        result["change"] = change
+        if change > threshold:
+            regressions.append(
+                f"{result['operation']} n={result['messages']} "
+                f"enc={result['encrypted']}: {before['median_ms']:.3f}ms -> "
+                f"{result['median_ms']:.3f}ms (+{change:.0%})"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the context engine")
+    parser.add_argument("--sizes", default="100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON run")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="Allowed median slowdown vs baseline before failing (0.25 = 25%%)",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    results = asyncio.run(run_suite(sizes, args.repeat, args.seed))
+
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        regressions = compare(results, baseline, args.max_regression)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": time.time(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": results,
+        "regressions": regressions,
+    }
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(encoded + "\n")
+    else:
+        print(encoded)
+
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+"""
+Load test for the /ask pipeline against a local mock Mistral server
+
+Usage:
+    python benchmarks/loadtest_ask.py --rate 50 --duration 30 --latency-ms 400 \\
+        --tool-call-rate 0.6 --error-429-rate 0.02 --output loadtest.json
+
+    # Three endpoints of increasing latency, the slowest of which is down
+    python benchmarks/loadtest_ask.py --endpoints 3 --down-endpoints 1
+
+The mock server mimics the chat completions API (including tool_calls and 429s)
+and the real `ask` command body is driven with fake discord.Interaction objects
+at a fixed arrival rate. Nothing leaves the machine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from aiohttp import web
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class MockMistralServer:
+    def __init__(
+        self,
+        latency_ms: float,
+        jitter_ms: float,
+        tool_call_rate: float,
+        error_429_rate: float,
+        seed: int,
+        down: bool = False,
+    ):
+        self.down = down
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tool_call_rate = tool_call_rate
+        self.error_429_rate = error_429_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.responses: dict[str, int] = {}
+        self.models: dict[str, int] = {}
+        self.runner: web.AppRunner | None = None
+
+    def _count(self, kind: str) -> None:
+        self.responses[kind] = self.responses.get(kind, 0) + 1
+
+    async def handle_completion(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        payload = await request.json()
+        model = str(payload.get("model"))
+        self.models[model] = self.models.get(model, 0) + 1
+        delay = max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        if self.down:
+            self._count("503")
+            return web.json_response({"message": "Service unavailable"}, status=503)
+
+        if self.rng.random() < self.error_429_rate:
+            self._count("429")
+            return web.json_response(
+                {"message": "Requests rate limit exceeded"}, status=429
+            )
+
+        messages = payload.get("messages", [])
+        wants_tools = bool(payload.get("tools")) and not any(
+            msg.get("role") == "tool" for msg in messages
+        )
+        prompt_tokens = sum(len(str(msg.get("content", ""))) for msg in messages) // 4
+
+        if wants_tools and self.rng.random() < self.tool_call_rate:
+            self._count("tool_calls")
+            message = {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {
+                        "id": f"call_{self.requests}",
+                        "type": "function",
+                        "function": {
+                            "name": "fetch_recent_messages",
+                            "arguments": json.dumps({"limit": 10}),
+                        },
+                    }
+                ],
+            }
+            finish_reason = "tool_calls"
+        else:
+            self._count("200")
+            message = {
+                "role": "assistant",
+                "content": "Mock answer " + "lorem ipsum " * self.rng.randint(5, 40),
+            }
+            finish_reason = "stop"
+
+        completion_tokens = len(message["content"]) // 4 + 8
+        return web.json_response(
+            {
+                "id": f"mock-{self.requests}",
+                "object": "chat.completion",
+                "model": payload.get("model"),
+                "choices": [
+                    {"index": 0, "message": message, "finish_reason": finish_reason}
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+    async def start(self, port: int) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle_completion)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", port).start()
+
+    async def stop(self) -> None:
+        if self.runner:
+            await self.runner.cleanup()
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.name = f"loadtest{user_id}"
+        self.display_name = self.name
+        self.global_name = self.name
+        self.bot = False
+        self.mention = f"<@{user_id}>"
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+    async def history(self, limit: int = 100):
+        # No Discord backfill in load tests; stored context is the only history
+        return
+        yield
+
+
+class FakeResponse:
+    def __init__(self, interaction: FakeInteraction):
+        self.interaction = interaction
+
+    async def defer(self, thinking: bool = False, ephemeral: bool = False) -> None:
+        self.interaction.deferred_at = time.perf_counter()
+
+    async def send_message(self, *args, **kwargs) -> None:
+        await self.interaction.followup.send(*args, **kwargs)
+
+
+class FakeFollowup:
+    def __init__(self, interaction: FakeInteraction):
+        self.interaction = interaction
+
+    async def send(self, content: Any = None, *, embed: Any = None, **kwargs) -> None:
+        self.interaction.completed_at = time.perf_counter()
+        self.interaction.embed = embed
+
+
+class FakeInteraction:
+    def __init__(self, interaction_id: int, channel_id: int, user_id: int):
+        self.id = interaction_id
+        self.channel_id = channel_id
+        self.channel = FakeChannel(channel_id)
+        self.guild = None
+        self.guild_id = None
+        self.user = FakeUser(user_id)
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.deferred_at: float | None = None
+        self.completed_at: float | None = None
+        self.embed = None
+
+    @property
+    def failed(self) -> bool:
+        return self.embed is None or self.embed.title != "Response"
+
+
+def _percentile(ordered: list[float], q: float) -> float | None:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_load(args: argparse.Namespace) -> dict[str, Any]:
+    ports = [_free_port() for _ in range(args.endpoints)]
+    data_dir = tempfile.mkdtemp(prefix="okapi-loadtest-")
+
+    # Configure the bot modules before they are imported
+    urls = [f"http://127.0.0.1:{port}/v1/chat/completions" for port in ports]
+    os.environ["MISTRAL_API_URL"] = urls[0]
+    if len(urls) > 1:
+        os.environ["MISTRAL_ENDPOINTS"] = ",".join(urls)
+    os.environ["MISTRAL_API_KEY"] = "loadtest"
+    os.environ["CONTEXT_DATA_DIR"] = data_dir
+    if not args.encrypt:
+        os.environ["DATA_ENCRYPTION_KEY"] = ""
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+    from commands.ask import ask  # noqa: E402
+    from commands.shared import get_context_manager, get_usage_ledger  # noqa: E402
+    from loop_monitor import loop_monitor  # noqa: E402
+    from runtime_stats import RuntimeStatsCollector  # noqa: E402
+
+    # Each extra endpoint is slower than the last; the final --down-endpoints fail
+    servers = [
+        MockMistralServer(
+            args.latency_ms * (1 + args.endpoint_latency_spread * i),
+            args.jitter_ms,
+            args.tool_call_rate,
+            args.error_429_rate,
+            args.seed + i,
+            down=i >= args.endpoints - args.down_endpoints,
+        )
+        for i in range(args.endpoints)
+    ]
+    for server, port in zip(servers, ports):
+        await server.start(port)
+
+    context_mgr, _ = get_context_manager()
+    loop_monitor.start()
+    process_stats = RuntimeStatsCollector(interval=1.0)
+    process_stats.start(context_mgr)
+
+    rng = random.Random(args.seed)
+    queries = [
+        "what is the capital of france?",
+        "can you summarize what we talked about earlier?",
+        "and what did you say before about caching?",
+        "write a haiku about giraffes",
+        "explain how encryption at rest works in two sentences",
+    ]
+
+    interactions: list[FakeInteraction] = []
+    tasks: list[asyncio.Task] = []
+    started_at: dict[int, float] = {}
+    total = int(args.rate * args.duration)
+    interval = 1.0 / args.rate
+    load_start = time.perf_counter()
+
+    for i in range(total):
+        # Open-loop arrivals: keep the schedule even if responses fall behind
+        target = load_start + i * interval
+        delay = target - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        interaction = FakeInteraction(
+            interaction_id=1_000_000 + i,
+            channel_id=rng.randint(1, args.channels),
+            user_id=rng.randint(1, args.users),
+        )
+        interactions.append(interaction)
+        started_at[interaction.id] = time.perf_counter()
+        tasks.append(
+            asyncio.create_task(ask.callback(interaction, rng.choice(queries)))
+        )
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - load_start
+
+    latencies = sorted(
+        inter.completed_at - started_at[inter.id]
+        for inter in interactions
+        if inter.completed_at is not None and not inter.failed
+    )
+    errors = sum(1 for inter in interactions if inter.failed)
+    usage = get_usage_ledger().summarize(since_hours=1)
+    snapshot = process_stats.snapshot
+    process_stats.stop()
+    loop_monitor.stop()
+    for server in servers:
+        await server.stop()
+    await context_mgr.aclose()
+
+    return {
+        "config": {
+            "rate": args.rate,
+            "duration_s": args.duration,
+            "channels": args.channels,
+            "users": args.users,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "tool_call_rate": args.tool_call_rate,
+            "error_429_rate": args.error_429_rate,
+            "encrypted": bool(args.encrypt),
+            "endpoints": args.endpoints,
+            "down_endpoints": args.down_endpoints,
+        },
+        "requests": len(interactions),
+        "completed": len(latencies),
+        "errors": errors,
+        "error_rate": errors / len(interactions) if interactions else 0.0,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) * 1000 if latencies else None,
+            **{
+                f"p{int(q * 100)}": (
+                    value * 1000
+                    if (value := _percentile(latencies, q)) is not None
+                    else None
+                )
+                for q in (0.5, 0.9, 0.95, 0.99)
+            },
+            "max": latencies[-1] * 1000 if latencies else None,
+        },
+        "usage": {
+            "calls": usage.requests,
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "tokens_by_model": usage.by_model,
+        },
+        "mock_servers": [
+            {
+                "latency_ms": server.latency_ms,
+                "down": server.down,
+                "requests": server.requests,
+                "responses": server.responses,
+                "models": server.models,
+            }
+            for server in servers
+        ],
+        "process": {
+            "rss_bytes": snapshot.rss_bytes,
+            "cpu_percent": snapshot.cpu_percent,
+            "max_loop_lag_ms": snapshot.loop_lag_s * 1000,
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test /ask with a mock Mistral")
+    parser.add_argument("--rate", type=float, default=20, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load")
+    parser.add_argument("--channels", type=int, default=25)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--tool-call-rate", type=float, default=0.5)
+    parser.add_argument("--error-429-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--endpoints", type=int, default=1, help="Mock endpoints in the pool"
+    )
+    parser.add_argument(
+        "--endpoint-latency-spread",
+        type=float,
+        default=0.5,
+        help="Endpoint i gets latency-ms * (1 + spread * i)",
+    )
+    parser.add_argument(
+        "--down-endpoints", type=int, default=0, help="Endpoints that always 503"
+    )
+    parser.add_argument("--encrypt", action="store_true", help="Encrypt contexts")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.encrypt and not os.getenv("DATA_ENCRYPTION_KEY"):
+        import base64
+
+        os.environ["DATA_ENCRYPTION_KEY"] = base64.b64encode(os.urandom(32)).decode()
+
+    report = asyncio.run(run_load(args))
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(encoded + "\n")
+    print(encoded)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,12 +6,28 @@ Discord.py Documentation: https://discordpy.readthedocs.io/en/stable/
 Mistral API Documentation: https://docs.mistral.ai/api/
 """
 
+import asyncio
 import discord
 from discord.ext import commands
 import signal
 import sys
-
-from config import DISCORD_TOKEN, GUILD_ID, GUILD_IDS
+from pathlib import Path
+
+from config import (
+    COMMAND_SYNC_CONCURRENCY,
+    COMMAND_SYNC_FORCE,
+    CONTEXT_DATA_DIR,
+    DISCORD_TOKEN,
+    GUILD_ID,
+    GUILD_IDS,
+    METRICS_HOST,
+    METRICS_PORT,
+    PROFILING_ENABLED,
+    WARM_START_BACKGROUND,
+    SHARDING_ENABLED,
+    SHARD_COUNT,
+    SHARD_IDS,
+)
 from commands import (
     ping,
     ask,
@@ -19,14 +35,32 @@ from commands import (
     usage_command,
     security_command,
     privacy_command,
+    profile_command,
     get_context_manager,
+    get_usage_ledger,
 )
+from command_sync import CommandSyncer
+from loop_monitor import loop_monitor
+from metrics import start_metrics_server
+from profiling import profiler
+from runtime_stats import runtime_stats
 
 
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+if SHARDING_ENABLED:
+    bot = commands.AutoShardedBot(
+        command_prefix="!",
+        intents=intents,
+        shard_count=SHARD_COUNT,
+        shard_ids=SHARD_IDS or None,
+    )
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents)
+
+# Command registration is application-wide, so only the process owning shard 0 syncs
+SYNCS_COMMANDS = not SHARD_IDS or 0 in SHARD_IDS
 
 # Build a de-duplicated list of allowed guilds. If provided, we only register per-guild (no globals).
 allowed_guild_ids = set()
@@ -43,15 +77,89 @@ for gid in GUILD_IDS or []:
 
 ALLOWED_GUILDS = [discord.Object(id=g) for g in sorted(allowed_guild_ids)]
 
+command_syncer = CommandSyncer(
+    bot.tree,
+    Path(CONTEXT_DATA_DIR).parent / "command_sync.json",
+    concurrency=COMMAND_SYNC_CONCURRENCY,
+    force=COMMAND_SYNC_FORCE,
+)
+_commands_synced = False
+_background_tasks = set()
+
+
+@bot.event
+async def setup_hook():
+    context_mgr, _ = get_context_manager()
+    if WARM_START_BACKGROUND:
+        _background_tasks.add(asyncio.create_task(context_mgr.warm_start()))
+    else:
+        await context_mgr.warm_start()
+    loop_monitor.start()
+    profiler.bind_loop_thread()
+    runtime_stats.start(context_mgr)
+
+    if METRICS_PORT:
+        try:
+            await start_metrics_server(METRICS_HOST, METRICS_PORT)
+        except Exception as e:
+            print(f"Failed to start metrics endpoint: {e}")
+
+    # Once the loop is running, signals flush asynchronously instead of blocking it
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, request_shutdown, signum)
+        except NotImplementedError:
+            pass
+
+
+_shutdown_task = None
+
+
+def request_shutdown(signum):
+    global _shutdown_task
+    if _shutdown_task is not None:
+        print(f"\nReceived signal {signum} again, shutdown already in progress")
+        return
+    print(f"\nReceived signal {signum}. Shutting down")
+    _shutdown_task = asyncio.get_running_loop().create_task(graceful_shutdown())
+
+
+async def graceful_shutdown():
+    # bot.close() ends bot.run(), which cancels every other task, so it has to
+    # come last. Events still delivered meanwhile bypass the ingest buffer once
+    # aclose() starts and are written inline after its final flush.
+    try:
+        context_mgr, _ = get_context_manager()
+        await context_mgr.aclose()
+    except Exception as e:
+        print(f"Error during shutdown: {e}")
+    try:
+        get_usage_ledger().flush()
+    except Exception as e:
+        print(f"Error flushing usage ledger: {e}")
+    finally:
+        runtime_stats.stop()
+        loop_monitor.stop()
+        await bot.close()
+
 
 @bot.event
 async def on_ready():
-    print(f"{bot.user} has initialized")
+    global _commands_synced
+    print(
+        f"{bot.user} has initialized (shards: {getattr(bot, 'shard_ids', None) or 'unsharded'})"
+    )
 
     print(
         f"Commands in tree before sync: {[cmd.name for cmd in bot.tree.get_commands()]}"
     )
 
+    # on_ready also fires after gateway reconnects; registration only needs to run once
+    if _commands_synced:
+        return
+    _commands_synced = True
+
     try:
         bot.tree.clear_commands(guild=None)
 
@@ -64,10 +172,10 @@ async def on_ready():
                 bot.tree.add_command(usage_command, guild=g)
                 bot.tree.add_command(security_command, guild=g)
                 bot.tree.add_command(privacy_command, guild=g)
-                synced = await bot.tree.sync(guild=g)
-                print(f"Synced {len(synced)} command(s) to guild {g.id}")
-            cleaned = await bot.tree.sync()
-            print(f"Cleared global commands; now {len(cleaned)} present globally")
+                if PROFILING_ENABLED:
+                    bot.tree.add_command(profile_command, guild=g)
+            # The empty global scope clears any previously registered globals
+            scopes = [*ALLOWED_GUILDS, None]
         else:
             bot.tree.add_command(ping)
             bot.tree.add_command(ask)
@@ -75,15 +183,13 @@ async def on_ready():
             bot.tree.add_command(usage_command)
             bot.tree.add_command(security_command)
             bot.tree.add_command(privacy_command)
-            synced_global = await bot.tree.sync()
-            print(f"Synced {len(synced_global)} command(s) globally")
-
-            for guild in bot.guilds:
-                try:
-                    cleaned = await bot.tree.sync(guild=guild)
-                    print(f"Ensured {len(cleaned)} command(s) for guild {guild.id}")
-                except Exception as guild_sync_error:
-                    print(f"Failed to sync guild {guild.id}: {guild_sync_error}")
+            if PROFILING_ENABLED:
+                bot.tree.add_command(profile_command)
+            scopes = [None, *bot.guilds]
+
+        if not SYNCS_COMMANDS:
+            return
+        await command_syncer.sync(bot.application_id, scopes)
     except Exception as e:
         print(f"Failed to sync commands: {e}")
 
@@ -97,13 +203,10 @@ async def on_message(message):
 
     context_mgr, _ = get_context_manager()
 
-    existing_context = await context_mgr.get_conversation_context(
-        channel_id, create_if_missing=False
-    )
-
-    if existing_context and not message.content.startswith("/"):
+    # Passive messages are only tracked in channels that already have a context
+    if context_mgr.is_known_channel(channel_id) and not message.content.startswith("/"):
         try:
-            await context_mgr.add_user_message(channel_id, message)
+            context_mgr.buffer_user_message(channel_id, message)
         except Exception as e:
             print(f"Error storing message context: {e}")
 
@@ -120,6 +223,10 @@ def shutdown(exit_code: int = 0):
         context_mgr.shutdown()
     except Exception as e:
         print(f"Error during shutdown: {e}")
+    try:
+        get_usage_ledger().flush()
+    except Exception as e:
+        print(f"Error flushing usage ledger: {e}")
     finally:
         sys.exit(exit_code)
 
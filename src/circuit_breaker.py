@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+
+from metrics import (
+    MISTRAL_CIRCUIT_REJECTIONS,
+    MISTRAL_CIRCUIT_STATE,
+    MISTRAL_CIRCUIT_TRANSITIONS,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, name: str, retry_after_s: float):
+        super().__init__(
+            f"{name} is temporarily unavailable; retry in {retry_after_s:.0f}s"
+        )
+        self.retry_after_s = retry_after_s
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures instead of waiting on timeouts.
+
+    Closed: calls pass; failures inside `window_s` are counted. Once
+    `failure_threshold` failures make up at least `failure_ratio` of recent
+    calls, the breaker opens. Open: calls are rejected until `open_s` has
+    passed. Half-open: up to `half_open_probes` calls go through; one success
+    closes the breaker and a failure opens it again. Only those probes decide
+    the half-open outcome, and calls that never completed count for nothing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        failure_ratio: float = 0.5,
+        window_s: float = 30.0,
+        open_s: float = 30.0,
+        half_open_probes: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_ratio = failure_ratio
+        self.window_s = window_s
+        self.open_s = open_s
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._probes_in_flight = 0
+        # Bumped on every transition so probe tokens from an old state are ignored
+        self._epoch = 0
+        MISTRAL_CIRCUIT_STATE.set(_STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        print(f"Circuit {self.name}: {self.state} -> {state}")
+        self.state = state
+        MISTRAL_CIRCUIT_STATE.set(_STATE_VALUES[state])
+        MISTRAL_CIRCUIT_TRANSITIONS.inc(state=state)
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._probes_in_flight = 0
+        self._epoch += 1
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.open_s - time.monotonic())
+
+    def before_call(self) -> int | None:
+        """Raise CircuitOpenError if the call should not be attempted.
+
+        Returns a probe token for half-open probes (None otherwise), to be
+        passed back to record().
+        """
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                MISTRAL_CIRCUIT_REJECTIONS.inc()
+                raise CircuitOpenError(self.name, self.retry_after())
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                MISTRAL_CIRCUIT_REJECTIONS.inc()
+                raise CircuitOpenError(self.name, 1.0)
+            self._probes_in_flight += 1
+            return self._epoch
+        return None
+
+    def record(self, ok: bool | None, probe: int | None = None) -> None:
+        """Record a call's outcome; `ok=None` means it never completed."""
+        if self.state == HALF_OPEN:
+            if probe != self._epoch:
+                # A call admitted before the breaker opened has finished late
+                return
+            if ok is None:
+                # A cancelled probe proves nothing; let another call probe
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                return
+            self._transition(CLOSED if ok else OPEN)
+            return
+        if self.state == OPEN or ok is None:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and self._outcomes[0][0] < now - self.window_s:
+            self._outcomes.popleft()
+        if ok:
+            return
+        failures = sum(1 for _, outcome_ok in self._outcomes if not outcome_ok)
+        if (
+            failures >= self.failure_threshold
+            and failures / len(self._outcomes) >= self.failure_ratio
+        ):
+            self._transition(OPEN)
+
+    def describe(self) -> str:
+        if self.state == OPEN:
+            return f"open ({self.retry_after():.0f}s left)"
+        if self.state == HALF_OPEN:
+            return "half-open (probing)"
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return f"closed ({failures} recent failures)"
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional
+
+import discord
+from discord import app_commands
+
+from fs_utils import atomic_write_bytes
+
+
+def _scope_key(guild: Optional[discord.abc.Snowflake]) -> str:
+    return "global" if guild is None else str(guild.id)
+
+
+class CommandSyncer:
+    """Syncs the command tree only to scopes whose payload changed since last time."""
+
+    def __init__(
+        self,
+        tree: app_commands.CommandTree,
+        state_path: Path,
+        concurrency: int = 4,
+        force: bool = False,
+    ):
+        self.tree = tree
+        self.state_path = Path(state_path)
+        self.concurrency = max(1, concurrency)
+        self.force = force
+        self._hashes: dict[str, dict[str, str]] = self._load()
+
+    def _load(self) -> dict[str, dict[str, str]]:
+        try:
+            return json.loads(self.state_path.read_text())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable command sync state: {e}")
+            return {}
+
+    def _save(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(
+            self.state_path, json.dumps(self._hashes, indent=2).encode("utf-8")
+        )
+
+    def payload_hash(self, guild: Optional[discord.abc.Snowflake]) -> str:
+        payload = sorted(
+            (cmd.to_dict(self.tree) for cmd in self.tree.get_commands(guild=guild)),
+            key=lambda data: (data.get("type", 1), data["name"]),
+        )
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    async def sync(
+        self,
+        application_id: int,
+        guilds: list[Optional[discord.abc.Snowflake]],
+    ) -> None:
+        # Keyed by application so several bots can share one data directory
+        hashes = self._hashes.setdefault(str(application_id), {})
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def sync_scope(guild: Optional[discord.abc.Snowflake]) -> None:
+            scope = _scope_key(guild)
+            digest = self.payload_hash(guild)
+            if not self.force and hashes.get(scope) == digest:
+                print(f"Commands unchanged for {scope}, skipping sync")
+                return
+            async with semaphore:
+                try:
+                    synced = await self.tree.sync(guild=guild)
+                except Exception as e:
+                    print(f"Failed to sync commands for {scope}: {e}")
+                    return
+            hashes[scope] = digest
+            print(f"Synced {len(synced)} command(s) to {scope}")
+
+        await asyncio.gather(*(sync_scope(guild) for guild in guilds))
+        self._save()
@@ -4,7 +4,8 @@ from .amnesia import amnesia_command
 from .usage import usage_command
 from .security import security_command
 from .privacy import privacy_command
-from .shared import get_context_manager
+from .profile import profile_command
+from .shared import get_context_manager, get_usage_ledger
 
 __all__ = [
     "ping",
@@ -13,5 +14,7 @@ __all__ = [
     "usage_command",
     "security_command",
     "privacy_command",
+    "profile_command",
     "get_context_manager",
+    "get_usage_ledger",
 ]
@@ -56,14 +56,20 @@ async def amnesia_command(
         )
     else:
         # Clear last N messages
-        context.messages = context.messages[:-count]
-        context.total_tokens = sum(msg.token_count for msg in context.messages)
-        await context_mgr._save_context(context)
+        context = await context_mgr.truncate_conversation(channel_id, count)
 
-        embed = build_success_embed(
-            "Memory Cleared",
-            f"Successfully deleted {count} recent messages. {len(context.messages)} messages remaining.",
-            footer_text="No model",
-        )
+        if context is None:
+            # Cleared or evicted since the lookup above
+            embed = build_success_embed(
+                "No Memory Found",
+                "There's no conversation history to clear in this channel.",
+                footer_text="No model",
+            )
+        else:
+            embed = build_success_embed(
+                "Memory Cleared",
+                f"Successfully deleted {count} recent messages. {len(context.messages)} messages remaining.",
+                footer_text="No model",
+            )
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -1,26 +1,61 @@
 from __future__ import annotations
 
+import time
+
 import discord
 from discord import app_commands
 
-from datetime import datetime, timezone
-
+from circuit_breaker import CircuitOpenError
 from embeds import build_error_embed, build_success_embed
-from config import MODEL_DISPLAY_NAME
-from mistral_client import MistralClient
-from context_tools import process_tool_calls
-from commands.shared import get_context_manager
+from context_tools import PAGING_TOOL_DEFINITIONS, process_tool_calls
+from commands.shared import (
+    get_context_manager,
+    get_mistral_client,
+    get_usage_ledger,
+)
+from profiling import profiler
+from prompts import build_ask_messages
+from tracing import tracer
+
+# Extra completions allowed for following fetch_messages_in_range cursors
+_MAX_RANGE_PAGE_FOLLOW_UPS = 3
 
 
 @app_commands.command(name="ask", description="Ask Okapi a question (context-aware)")
 @app_commands.describe(query="Your question for Okapi")
 async def ask(interaction: discord.Interaction, query: str):
-    client = MistralClient()
+    async with profiler.profile_ask():
+        with tracer.request("ask", interaction.id):
+            await _ask(interaction, query)
+
+
+def _record_usage(
+    interaction: discord.Interaction,
+    data: dict,
+    model: str,
+    latency_s: float,
+) -> None:
+    usage = data.get("usage") or {}
+    message = (data.get("choices") or [{}])[0].get("message") or {}
+    get_usage_ledger().record(
+        channel_id=str(interaction.channel_id),
+        user_id=str(interaction.user.id),
+        model=data.get("model") or model,
+        prompt_tokens=int(usage.get("prompt_tokens") or 0),
+        completion_tokens=int(usage.get("completion_tokens") or 0),
+        latency_s=latency_s,
+        tool_calls=len(message.get("tool_calls") or []),
+    )
+
+
+async def _ask(interaction: discord.Interaction, query: str):
+    client = get_mistral_client()
     channel_id = str(interaction.channel_id)
     context_mgr, ctx_tools = get_context_manager()
 
     try:
-        await interaction.response.defer(thinking=True)
+        with tracer.span("defer"):
+            await interaction.response.defer(thinking=True)
 
         mock_message = type(
             "MockMessage",
@@ -34,7 +69,8 @@ async def ask(interaction: discord.Interaction, query: str):
         )()
 
         # Store the message but DON'T automatically load conversation history
-        await context_mgr.add_user_message(channel_id, mock_message)
+        with tracer.span("add_user_message"):
+            await context_mgr.add_user_message(channel_id, mock_message)
 
         tools = ctx_tools.get_tool_definitions()
 
@@ -45,61 +81,15 @@ async def ask(interaction: discord.Interaction, query: str):
             or "the user"
         )
 
-        current_datetime = datetime.now(timezone.utc).strftime(
-            "%A, %B %d, %Y at %I:%M %p UTC"
-        )
+        conversation_messages = build_ask_messages(user_preferred_name, query)
+        route = client.route(query)
 
-        conversation_messages = [
-            {
-                "role": "system",
-                "content": f"The current date and time is {current_datetime}.",
-            },
-            {
-                "role": "system",
-                "content": (
-                    f"The current user's preferred name is '{user_preferred_name}'. "
-                    "Address them by name only during greeting and do not invent personal details."
-                ),
-            },
-            {
-                "role": "system",
-                "content": (
-                    "You have access to conversation history tools. You should use them for virtually all messages to maintain conversational continuity:\n"
-                    "- Use 'fetch_recent_messages' by default to understand the conversation flow and provide contextually relevant responses.\n"
-                    "- Use 'search_conversation_history' when the user asks about specific past topics or when recent messages aren't sufficient.\n"
-                    "- ONLY skip context tools if the user is asking a completely standalone question that has no possible relation to previous conversation (e.g., 'what is 2+2?', 'define photosynthesis').\n"
-                    "When in doubt, fetch context. Better to have context and not need it than to miss important conversational cues."
-                ),
-            },
-            {
-                "role": "system",
-                "content": (
-                    "Tone and formality guidelines:\n"
-                    "1. SENSITIVE TOPICS (terrorism, violence, death, tragedy, war crimes, genocide, serious historical atrocities):\n"
-                    "   - ALWAYS use formal, respectful tone regardless of user's style\n"
-                    "   - NEVER use emojis, casual phrases, or exclamation marks\n"
-                    "   - Be factual, clear, and appropriately serious\n"
-                    "2. CASUAL TOPICS (general chat, lighthearted questions, everyday topics):\n"
-                    "   - Match the user's tone and energy\n"
-                    "   - If they write in lowercase, you can too\n"
-                    "   - Be playful with playful messages\n"
-                    "\n"
-                    "3. TECHNICAL/EDUCATIONAL TOPICS:\n"
-                    "   - Use clear, professional language\n"
-                    "   - Be concise and informative\n"
-                    "\n"
-                    "Read the context and adapt appropriately. When in doubt about sensitivity, err on the side of formality."
-                ),
-            },
-            {
-                "role": "user",
-                "content": query,
-            },
-        ]
-
-        data = await client.create_context_aware_completion(
-            conversation_messages=conversation_messages, tools=tools
-        )
+        with tracer.span("first_completion"):
+            started = time.perf_counter()
+            data = await client.create_context_aware_completion(
+                conversation_messages=conversation_messages, tools=tools, route=route
+            )
+        _record_usage(interaction, data, route.model_id, time.perf_counter() - started)
 
         choice = data.get("choices", [{}])[0]
         message = choice.get("message", {})
@@ -108,13 +98,17 @@ async def ask(interaction: discord.Interaction, query: str):
         context_tools_used = False
         tools_called = []
 
-        if message.get("tool_calls"):
-            tool_results = await process_tool_calls(
-                message["tool_calls"],
-                ctx_tools,
-                channel_id,
-                interaction.channel if hasattr(interaction, "channel") else None,
-            )
+        for tool_round in range(1 + _MAX_RANGE_PAGE_FOLLOW_UPS):
+            if not message.get("tool_calls"):
+                break
+            with tracer.span("process_tool_calls"):
+                tool_results, has_more_pages = await process_tool_calls(
+                    message["tool_calls"],
+                    ctx_tools,
+                    channel_id,
+                    interaction.channel if hasattr(interaction, "channel") else None,
+                    interaction.user,
+                )
 
             # Track which tools were called
             for tool_call in message["tool_calls"]:
@@ -123,6 +117,7 @@ async def ask(interaction: discord.Interaction, query: str):
                 if tool_name in [
                     "fetch_recent_messages",
                     "search_conversation_history",
+                    "fetch_messages_in_range",
                 ]:
                     context_tools_used = True
 
@@ -137,7 +132,20 @@ async def ask(interaction: discord.Interaction, query: str):
             for tool_result in tool_results:
                 conversation_messages.append(tool_result)
 
-            data = await client.create_chat_completion(messages=conversation_messages)
+            # Only a range page with a cursor earns the model another tool call
+            has_more_pages = has_more_pages and tool_round < _MAX_RANGE_PAGE_FOLLOW_UPS
+
+            with tracer.span("second_completion"):
+                started = time.perf_counter()
+                data = await client.create_chat_completion(
+                    messages=conversation_messages,
+                    tools=PAGING_TOOL_DEFINITIONS if has_more_pages else None,
+                    call_name="second",
+                    route=route,
+                )
+            _record_usage(
+                interaction, data, route.model_id, time.perf_counter() - started
+            )
 
             choice = data.get("choices", [{}])[0]
             message = choice.get("message", {})
@@ -163,10 +171,11 @@ async def ask(interaction: discord.Interaction, query: str):
         if not answer_text:
             answer_text = "(No content returned by the model)"
 
-        await context_mgr.add_bot_response(channel_id, answer_text)
+        with tracer.span("add_bot_response"):
+            await context_mgr.add_bot_response(channel_id, answer_text)
 
         embed = build_success_embed(
-            "Response", answer_text, footer_text=MODEL_DISPLAY_NAME
+            "Response", answer_text, footer_text=route.display_name
         )
         embed.add_field(name="Question", value=query[:1024], inline=False)
 
@@ -184,8 +193,19 @@ async def ask(interaction: discord.Interaction, query: str):
                 inline=True,
             )
 
-        await interaction.followup.send(embed=embed)
+        with tracer.span("followup_send"):
+            await interaction.followup.send(embed=embed)
 
+    except CircuitOpenError as e:
+        await interaction.followup.send(
+            embed=build_error_embed(
+                "Okapi is temporarily unavailable",
+                "The model provider is failing right now, so requests are paused "
+                f"to let it recover. Please try again in about {e.retry_after_s:.0f} seconds.",
+                footer_text="No model",
+            ),
+            ephemeral=True,
+        )
     except Exception as e:
         await interaction.followup.send(
             embed=build_error_embed("Mistral error", str(e), footer_text="No model"),
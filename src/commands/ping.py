@@ -7,7 +7,23 @@ from datetime import datetime, timedelta, timezone
 import discord
 from discord import app_commands
 
+from commands.shared import get_mistral_client
 from config import BOT_START_TIME_EPOCH_S
+from runtime_stats import runtime_stats
+
+
+def _format_bytes(size: float) -> str:
+    if size < 1024:
+        return f"{size:.0f} B"
+    for unit in ("KiB", "MiB"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GiB"
+
+
+def _format_ms(seconds: float | None) -> str:
+    return "n/a" if seconds is None else f"{seconds * 1000:.0f} ms"
 
 
 @app_commands.command(name="ping", description="Returns the bot's latency")
@@ -53,6 +69,43 @@ async def ping(interaction: discord.Interaction, verbose: bool = False):
             inline=True,
         )
         embed.add_field(name="Bot", value=bot_identity, inline=False)
+        embed.add_field(
+            name="Mistral Circuit",
+            value=get_mistral_client().breaker.describe(),
+            inline=True,
+        )
+
+        stats = runtime_stats.snapshot
+        if stats.sampled_at:
+            sample_age = max(0, int(time.time() - stats.sampled_at))
+            embed.add_field(
+                name="Process",
+                value=f"RSS {_format_bytes(stats.rss_bytes)}, CPU {stats.cpu_percent:.1f}%",
+                inline=True,
+            )
+            embed.add_field(
+                name="Loop Lag (max)",
+                value=_format_ms(stats.loop_lag_s),
+                inline=True,
+            )
+            embed.add_field(
+                name="Contexts",
+                value=f"{stats.active_contexts} active, {stats.active_tokens} tokens",
+                inline=True,
+            )
+            embed.add_field(
+                name="Mistral p50/p95",
+                value=f"{_format_ms(stats.mistral_p50_s)} / {_format_ms(stats.mistral_p95_s)}",
+                inline=True,
+            )
+            embed.add_field(
+                name="Store Size", value=_format_bytes(stats.store_bytes), inline=True
+            )
+            embed.add_field(name="Sampled", value=f"{sample_age}s ago", inline=True)
+        else:
+            embed.add_field(
+                name="Runtime", value="Collecting first sample", inline=False
+            )
 
     embed.set_footer(text="No model")
     embed.timestamp = responded_at
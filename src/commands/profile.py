@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import time
+
+import discord
+from discord import app_commands
+
+from config import PROFILING_ENABLED
+from embeds import build_error_embed, build_success_embed
+from commands.shared import get_context_manager
+from profiling import profiler
+from tracing import tracer
+
+
+async def _ensure_allowed(interaction: discord.Interaction) -> bool:
+    # Profilers slow down the whole process, so only the bot owner may start them
+    if PROFILING_ENABLED and await interaction.client.is_owner(interaction.user):
+        return True
+    await interaction.response.send_message(
+        embed=build_error_embed(
+            "Profiling Unavailable",
+            "Profiling is disabled or you are not the bot owner.",
+            footer_text="No model",
+        ),
+        ephemeral=True,
+    )
+    return False
+
+
+profile_command = app_commands.Group(
+    name="profile",
+    description="Owner-only profiling of the running bot",
+    guild_only=True,
+    default_permissions=discord.Permissions(administrator=True),
+)
+
+
+@profile_command.command(
+    name="ask", description="Capture a cProfile of the next /ask executions"
+)
+@app_commands.describe(count="Number of /ask executions to profile")
+async def profile_ask(
+    interaction: discord.Interaction, count: app_commands.Range[int, 1, 50] = 5
+):
+    if not await _ensure_allowed(interaction):
+        return
+    profiler.arm_ask_profile(count)
+    await interaction.response.send_message(
+        embed=build_success_embed(
+            "Profiling Armed",
+            f"The next {count} /ask execution(s) will be profiled. "
+            f"Results are written as .pstats to `{profiler.output_dir}`.",
+            footer_text="No model",
+        ),
+        ephemeral=True,
+    )
+
+
+@profile_command.command(
+    name="memory", description="Take a tracemalloc snapshot and diff it"
+)
+@app_commands.describe(stop="Stop tracing instead of taking a snapshot")
+async def profile_memory(interaction: discord.Interaction, stop: bool = False):
+    if not await _ensure_allowed(interaction):
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    if stop:
+        profiler.stop_memory_tracing()
+        description = "Memory tracing stopped."
+    else:
+        context_mgr, _ = get_context_manager()
+        path = await profiler.memory_snapshot(context_mgr.active_contexts.total_bytes)
+        description = (
+            "Memory tracing started. Run this again later to diff against now."
+            if path is None
+            else f"Wrote allocation diff to `{path}`."
+        )
+    await interaction.followup.send(
+        embed=build_success_embed(
+            "Memory Profile", description, footer_text="No model"
+        ),
+        ephemeral=True,
+    )
+
+
+@profile_command.command(
+    name="stacks", description="Sample the event loop's stacks for a few seconds"
+)
+@app_commands.describe(seconds="How long to sample")
+async def profile_stacks(
+    interaction: discord.Interaction,
+    seconds: app_commands.Range[float, 0.5, 30.0] = 5.0,
+):
+    if not await _ensure_allowed(interaction):
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    trace_path, folded_path = await profiler.sample_stacks(seconds)
+    await interaction.followup.send(
+        embed=build_success_embed(
+            "Stack Samples",
+            f"Chrome trace: `{trace_path}`\nFolded stacks: `{folded_path}`",
+            footer_text="No model",
+        ),
+        ephemeral=True,
+    )
+
+
+@profile_command.command(
+    name="trace", description="Export recent /ask stage traces as Chrome trace JSON"
+)
+async def profile_trace(interaction: discord.Interaction):
+    if not await _ensure_allowed(interaction):
+        return
+    path = tracer.export_chrome_trace(
+        profiler.output_dir / f"ask-trace-{int(time.time())}.trace.json"
+    )
+    await interaction.response.send_message(
+        embed=build_success_embed(
+            "Stage Trace",
+            f"Exported {len(tracer.recent)} recent request(s) to `{path}`.",
+            footer_text="No model",
+        ),
+        ephemeral=True,
+    )
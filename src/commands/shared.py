@@ -1,16 +1,79 @@
 from __future__ import annotations
 
+from pathlib import Path
+
+from config import (
+    CONTEXT_DATA_DIR,
+    DATA_ENCRYPTION_KEY,
+    SHARD_IDS,
+    USAGE_FLUSH_INTERVAL_S,
+    USAGE_RETENTION_DAYS,
+)
 from context_manager import ContextManager
 from context_tools import ContextTools
+from mistral_client import MistralClient
+from usage_ledger import UsageLedger
+from metrics import ACTIVE_CONTEXT_BYTES, ACTIVE_CONTEXTS, CONTEXT_CACHE_EVICTIONS
 
 
 context_manager = None
 context_tools = None
+mistral_client = None
+usage_ledger = None
+
+
+def shard_partition_name(shard_ids: list[int]) -> str:
+    ids = sorted(set(shard_ids))
+    if ids == list(range(ids[0], ids[-1] + 1)):
+        return f"shards_{ids[0]}-{ids[-1]}"
+    return "shards_" + "_".join(str(i) for i in ids)
+
+
+def process_partition() -> str | None:
+    # Names the files only this process writes (manifest, warm snapshot, usage)
+    return shard_partition_name(SHARD_IDS) if SHARD_IDS else None
+
+
+def context_data_dir() -> Path:
+    # A channel belongs to exactly one guild and so to one shard at a time, so
+    # all processes share one store; changing the shard layout strands nothing
+    return Path(CONTEXT_DATA_DIR)
 
 
 def get_context_manager():
     global context_manager, context_tools
     if context_manager is None:
-        context_manager = ContextManager()
+        context_manager = ContextManager(
+            context_data_dir(), partition=process_partition()
+        )
         context_tools = ContextTools(context_manager)
+
+        ACTIVE_CONTEXTS.set_function(lambda: len(context_manager.active_contexts))
+        ACTIVE_CONTEXT_BYTES.set_function(
+            lambda: context_manager.active_contexts.total_bytes
+        )
+        CONTEXT_CACHE_EVICTIONS.set_function(
+            lambda: context_manager.active_contexts.evictions
+        )
     return context_manager, context_tools
+
+
+def get_mistral_client() -> MistralClient:
+    # Shared so routing state and configuration are built once per process
+    global mistral_client
+    if mistral_client is None:
+        mistral_client = MistralClient()
+    return mistral_client
+
+
+def get_usage_ledger() -> UsageLedger:
+    global usage_ledger
+    if usage_ledger is None:
+        usage_ledger = UsageLedger(
+            context_data_dir() / "usage",
+            DATA_ENCRYPTION_KEY,
+            retention_days=USAGE_RETENTION_DAYS,
+            flush_interval_s=USAGE_FLUSH_INTERVAL_S,
+            partition=process_partition(),
+        )
+    return usage_ledger
@@ -5,7 +5,7 @@ import time as _time
 import discord
 from discord import app_commands
 
-from commands.shared import get_context_manager
+from commands.shared import get_context_manager, get_usage_ledger
 
 
 @app_commands.command(
@@ -18,11 +18,9 @@ async def usage_command(interaction: discord.Interaction, detailed: bool = False
     channel_id = str(interaction.channel_id)
     context_mgr, _ = get_context_manager()
 
-    context = await context_mgr.get_conversation_context(
-        channel_id, create_if_missing=False
-    )
+    stats = await context_mgr.get_channel_stats(channel_id)
 
-    if not context or not context.messages:
+    if not stats or not stats.message_count:
         # Use discord.Embed with fields for all data
         embed = discord.Embed(
             title="No Conversation Data", color=discord.Color(0x7ED957)
@@ -43,31 +41,43 @@ async def usage_command(interaction: discord.Interaction, detailed: bool = False
     embed.timestamp = discord.utils.utcnow()
 
     # Individual fields
-    total_messages = len(context.messages)
-    user_messages = sum(1 for msg in context.messages if not msg.is_bot)
-    bot_messages = total_messages - user_messages
-
     embed.add_field(name="Channel", value=str(channel_id), inline=True)
-    embed.add_field(name="Messages", value=str(total_messages), inline=True)
-    embed.add_field(name="User Messages", value=str(user_messages), inline=True)
-    embed.add_field(name="Bot Messages", value=str(bot_messages), inline=True)
-    embed.add_field(name="Total Tokens", value=str(context.total_tokens), inline=True)
+    embed.add_field(name="Messages", value=str(stats.message_count), inline=True)
+    embed.add_field(name="User Messages", value=str(stats.user_messages), inline=True)
+    embed.add_field(name="Bot Messages", value=str(stats.bot_messages), inline=True)
+    embed.add_field(name="Total Tokens", value=str(stats.total_tokens), inline=True)
     embed.add_field(
         name="Context Limit", value=str(context_mgr.max_context_tokens), inline=True
     )
 
     # Age and activity
-    age_hours = (_time.time() - context.created_at) / 3600
-    inactive_hours = (_time.time() - context.last_activity) / 3600
+    age_hours = (_time.time() - stats.created_at) / 3600
+    inactive_hours = (_time.time() - stats.last_activity) / 3600
     embed.add_field(name="Age", value=f"{age_hours:.1f}h", inline=True)
     embed.add_field(
         name="Last Activity", value=f"{inactive_hours:.1f}h ago", inline=True
     )
 
-    if detailed and context.messages:
-        recent_msgs = (
-            context.messages[-5:] if len(context.messages) > 5 else context.messages
+    # Actual token counts reported by Mistral, as opposed to the estimates above
+    ledger = get_usage_ledger()
+    channel_usage = ledger.summarize(since_hours=24, channel_id=channel_id)
+    if channel_usage.requests:
+        mean_ms = channel_usage.mean_latency_s * 1000
+        embed.add_field(
+            name="API Usage (24h)",
+            value=(
+                f"{channel_usage.requests} calls, "
+                f"{channel_usage.prompt_tokens} prompt + "
+                f"{channel_usage.completion_tokens} completion tokens\n"
+                f"Latency avg {mean_ms:.0f} ms, "
+                f"max {channel_usage.latency_s_max * 1000:.0f} ms"
+            ),
+            inline=False,
         )
+
+    if detailed:
+        # Only the detailed view needs message bodies, so only it loads the context
+        recent_msgs = await context_mgr.get_recent_messages(channel_id, limit=5)
         if recent_msgs:
             recent_text = "\n".join(
                 [
@@ -79,17 +89,51 @@ async def usage_command(interaction: discord.Interaction, detailed: bool = False
                 name="Recent Messages", value=recent_text[:1024], inline=False
             )
 
-        user_tokens = sum(msg.token_count for msg in context.messages if not msg.is_bot)
-        bot_tokens = sum(msg.token_count for msg in context.messages if msg.is_bot)
-        embed.add_field(name="User Tokens", value=str(user_tokens), inline=True)
-        embed.add_field(name="Bot Tokens", value=str(bot_tokens), inline=True)
+        embed.add_field(name="User Tokens", value=str(stats.user_tokens), inline=True)
+        embed.add_field(name="Bot Tokens", value=str(stats.bot_tokens), inline=True)
 
-        if context.total_tokens > context_mgr.max_context_tokens * 0.8:
+        if stats.total_tokens > context_mgr.max_context_tokens * 0.8:
             health = "Near limit"
-        elif context.total_tokens > context_mgr.max_context_tokens * 0.6:
+        elif stats.total_tokens > context_mgr.max_context_tokens * 0.6:
             health = "Sub-optimal"
         else:
             health = "Optimal"
         embed.add_field(name="Memory Health", value=health, inline=True)
 
+        week_usage = ledger.summarize(since_hours=24 * 7, channel_id=channel_id)
+        if week_usage.requests:
+            by_model = ", ".join(
+                f"{model}: {tokens}"
+                for model, tokens in sorted(
+                    week_usage.by_model.items(), key=lambda item: -item[1]
+                )
+            )
+            embed.add_field(
+                name="API Usage (7d)",
+                value=(
+                    f"{week_usage.requests} calls, {week_usage.total_tokens} tokens, "
+                    f"{week_usage.tool_calls} tool calls"
+                ),
+                inline=False,
+            )
+            embed.add_field(name="Tokens by Model", value=by_model[:1024], inline=False)
+            # Other users' consumption is only for the bot owner to see
+            if await interaction.client.is_owner(interaction.user):
+                top_users = ", ".join(
+                    f"<@{user_id}>: {tokens}"
+                    for user_id, tokens in sorted(
+                        week_usage.by_user.items(), key=lambda item: -item[1]
+                    )[:5]
+                )
+                embed.add_field(name="Top Users", value=top_users[:1024], inline=False)
+
+        own_usage = ledger.summarize(
+            since_hours=24 * 7, user_id=str(interaction.user.id)
+        )
+        embed.add_field(
+            name="Your Usage (7d, all channels)",
+            value=f"{own_usage.requests} calls, {own_usage.total_tokens} tokens",
+            inline=False,
+        )
+
     await interaction.response.send_message(embed=embed, ephemeral=True)
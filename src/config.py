@@ -1,5 +1,6 @@
 import os
 import time
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,9 +22,133 @@ MISTRAL_API_URL: str = os.getenv(
     "https://api.mistral.ai/v1/chat/completions",  # This doesn't change
 )
 
+# Optional pool of compatible endpoints, comma separated, each "url" or "url|api_key"
+# (entries without a key use MISTRAL_API_KEY). Overrides MISTRAL_API_URL when set
+_MISTRAL_ENDPOINTS_RAW = os.getenv("MISTRAL_ENDPOINTS", "")
+MISTRAL_ENDPOINTS: list[tuple[str, str | None]] = [
+    (url.strip(), key.strip() or None)
+    for url, _, key in (
+        entry.partition("|") for entry in _MISTRAL_ENDPOINTS_RAW.split(",")
+    )
+    if url.strip()
+]
+
+# Circuit breaker: after MISTRAL_BREAKER_FAILURES failures (5xx, 429, timeouts,
+# connection errors) within the window, fail fast for MISTRAL_BREAKER_OPEN_S
+MISTRAL_BREAKER_FAILURES: int = int(os.getenv("MISTRAL_BREAKER_FAILURES", "5"))
+MISTRAL_BREAKER_WINDOW_S: float = float(os.getenv("MISTRAL_BREAKER_WINDOW_S", "30"))
+MISTRAL_BREAKER_OPEN_S: float = float(os.getenv("MISTRAL_BREAKER_OPEN_S", "30"))
+
 MISTRAL_MODEL_ID: str = os.getenv("MISTRAL_MODEL_ID", "magistral-small-latest")
 MODEL_DISPLAY_NAME: str = os.getenv("MODEL_DISPLAY_NAME", "magistral-small-latest")
 MODEL_TEMPERATURE: float = float(os.getenv("MODEL_TEMPERATURE", "0.7"))
 
+# Optional fast model for short standalone questions; unset sends everything to
+# MISTRAL_MODEL_ID. Queries longer than MODEL_ROUTER_FAST_MAX_CHARS use the full model
+MISTRAL_FAST_MODEL_ID: str | None = os.getenv("MISTRAL_FAST_MODEL_ID") or None
+FAST_MODEL_DISPLAY_NAME: str | None = os.getenv("FAST_MODEL_DISPLAY_NAME") or None
+MODEL_ROUTER_FAST_MAX_CHARS: int = int(os.getenv("MODEL_ROUTER_FAST_MAX_CHARS", "160"))
+
 BOT_START_TIME_EPOCH_S: float = time.time()
 DATA_ENCRYPTION_KEY: str | None = os.getenv("DATA_ENCRYPTION_KEY")
+
+# Approximate memory budget for in-memory conversation contexts (bytes)
+CONTEXT_CACHE_MAX_BYTES: int = int(
+    os.getenv("CONTEXT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+# Contexts at least this large (approximate bytes) are serialized and encrypted
+# on a worker thread instead of the event loop
+CONTEXT_OFFLOAD_BYTES: int = int(os.getenv("CONTEXT_OFFLOAD_BYTES", str(256 * 1024)))
+CONTEXT_IO_WORKERS: int = int(os.getenv("CONTEXT_IO_WORKERS", "2"))
+
+# Passive channel messages are buffered and applied in batches: a batch flushes
+# after this delay, once it reaches the size cap, or when a command needs context
+INGEST_BATCH_DELAY_MS: int = int(os.getenv("INGEST_BATCH_DELAY_MS", "500"))
+INGEST_BATCH_MAX_MESSAGES: int = int(os.getenv("INGEST_BATCH_MAX_MESSAGES", "50"))
+
+# Tool results sent back to the model are compacted to at most this many estimated
+# tokens per tool call; single messages longer than TOOL_OUTPUT_MAX_MESSAGE_CHARS are cut
+TOOL_OUTPUT_TOKEN_BUDGET: int = int(os.getenv("TOOL_OUTPUT_TOKEN_BUDGET", "1500"))
+TOOL_OUTPUT_MAX_MESSAGE_CHARS: int = int(
+    os.getenv("TOOL_OUTPUT_MAX_MESSAGE_CHARS", "600")
+)
+
+# Guild-wide history search reads up to GUILD_SEARCH_CONCURRENCY channel contexts at
+# once, gives each GUILD_SEARCH_CHANNEL_TIMEOUT_S and returns what it has found by
+# GUILD_SEARCH_TIMEOUT_S. The reads get their own pool of that many threads.
+GUILD_SEARCH_CONCURRENCY: int = int(os.getenv("GUILD_SEARCH_CONCURRENCY", "8"))
+GUILD_SEARCH_CHANNEL_TIMEOUT_S: float = float(
+    os.getenv("GUILD_SEARCH_CHANNEL_TIMEOUT_S", "2")
+)
+GUILD_SEARCH_TIMEOUT_S: float = float(os.getenv("GUILD_SEARCH_TIMEOUT_S", "5"))
+
+# Actual Mistral token usage is kept in hourly buckets for this many days and
+# appended to disk at most every USAGE_FLUSH_INTERVAL_S seconds
+USAGE_RETENTION_DAYS: int = int(os.getenv("USAGE_RETENTION_DAYS", "30"))
+USAGE_FLUSH_INTERVAL_S: float = float(os.getenv("USAGE_FLUSH_INTERVAL_S", "60"))
+
+# Manifest changes are batched and written at most once per this many seconds
+MANIFEST_FLUSH_DELAY_S: float = float(os.getenv("MANIFEST_FLUSH_DELAY_S", "5"))
+
+# Upper bound on how long shutdown waits for unsaved contexts to be written
+SHUTDOWN_FLUSH_TIMEOUT_S: float = float(os.getenv("SHUTDOWN_FLUSH_TIMEOUT_S", "10"))
+
+# On shutdown the most recently used contexts (up to this many approximate bytes)
+# are written to one snapshot that the next start loads to warm the cache; 0 disables
+WARM_SNAPSHOT_MAX_BYTES: int = int(
+    os.getenv("WARM_SNAPSHOT_MAX_BYTES", str(16 * 1024 * 1024))
+)
+# Load the snapshot in the background instead of before connecting to Discord
+WARM_START_BACKGROUND: bool = os.getenv(
+    "WARM_START_BACKGROUND", "true"
+).strip().lower() in ("1", "true", "yes")
+
+CONTEXT_DATA_DIR: str = os.getenv(
+    "CONTEXT_DATA_DIR", str(Path(__file__).parent.parent / "data" / "conversations")
+)
+
+# Sharding: unset runs a single unsharded client, "auto" lets Discord pick the
+# shard count, an integer pins it. SHARD_IDS limits this process to a subset of
+# shards (set per process by launcher.py) and needs an explicit SHARD_COUNT.
+_SHARD_COUNT_RAW = os.getenv("SHARD_COUNT", "").strip().lower()
+SHARDING_ENABLED: bool = bool(_SHARD_COUNT_RAW)
+SHARD_COUNT: int | None = int(_SHARD_COUNT_RAW) if _SHARD_COUNT_RAW.isdigit() else None
+_SHARD_IDS_RAW = os.getenv("SHARD_IDS", "").strip()
+SHARD_IDS: list[int] = (
+    [int(x.strip()) for x in _SHARD_IDS_RAW.split(",") if x.strip()]
+    if _SHARD_IDS_RAW
+    else []
+)
+if SHARD_IDS and SHARD_COUNT is None:
+    # discord.py cannot split shards across processes without the total
+    raise RuntimeError("SHARD_IDS requires SHARD_COUNT to be set to a number")
+if any(not 0 <= shard_id < (SHARD_COUNT or 0) for shard_id in SHARD_IDS):
+    raise RuntimeError(f"SHARD_IDS must all be below SHARD_COUNT ({SHARD_COUNT})")
+
+# Opt-in Prometheus-style metrics endpoint; disabled unless METRICS_PORT is set
+METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT: int | None = (
+    int(os.getenv("METRICS_PORT")) if os.getenv("METRICS_PORT") else None
+)
+
+# Event loop watchdog heartbeat; SLOW_CALLBACK_MS > 0 also captures the stack of
+# any loop step that blocks longer than that
+LOOP_MONITOR_INTERVAL_MS: float = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "250"))
+SLOW_CALLBACK_MS: float = float(os.getenv("SLOW_CALLBACK_MS", "0"))
+
+# Bot-owner-only /profile command (cProfile, tracemalloc, stack sampling)
+PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "").strip().lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Slash commands are only re-synced for scopes whose payload hash changed since the
+# last sync; COMMAND_SYNC_FORCE ignores the cache for one start
+COMMAND_SYNC_CONCURRENCY: int = int(os.getenv("COMMAND_SYNC_CONCURRENCY", "4"))
+COMMAND_SYNC_FORCE: bool = os.getenv("COMMAND_SYNC_FORCE", "").strip().lower() in (
+    "1",
+    "true",
+    "yes",
+)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Iterator
+
+if TYPE_CHECKING:
+    from context_manager import ConversationContext
+
+
+# Rough per-object overheads for CPython dataclasses, dicts and strings. The goal
+# is a stable, cheap approximation rather than an exact sys.getsizeof walk.
+_CONTEXT_OVERHEAD_BYTES = 512
+_MESSAGE_OVERHEAD_BYTES = 360
+
+
+def estimate_context_bytes(context: ConversationContext) -> int:
+    size = _CONTEXT_OVERHEAD_BYTES + len(context.conversation_summary)
+    size += sum(len(keyword) + 56 for keyword in context.topic_keywords)
+    for msg in context.messages:
+        size += (
+            _MESSAGE_OVERHEAD_BYTES
+            + len(msg.content)
+            + len(msg.author_name)
+            + len(msg.id)
+            + len(msg.author_id)
+        )
+    return size
+
+
+class ContextCache:
+    """LRU cache of active conversation contexts bounded by approximate bytes."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        on_evict: Callable[[str, ConversationContext], None] | None = None,
+    ):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries: OrderedDict[str, ConversationContext] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def __contains__(self, channel_id: str) -> bool:
+        return channel_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def get(self, channel_id: str) -> ConversationContext | None:
+        context = self._entries.get(channel_id)
+        if context is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(channel_id)
+        self.hits += 1
+        return context
+
+    def peek(self, channel_id: str) -> ConversationContext | None:
+        """Look up a context without touching LRU order or hit/miss counters."""
+        return self._entries.get(channel_id)
+
+    def put(self, channel_id: str, context: ConversationContext) -> None:
+        """Insert or re-account a context and evict LRU entries over budget."""
+        size = estimate_context_bytes(context)
+        self.total_bytes += size - self._sizes.get(channel_id, 0)
+        self._sizes[channel_id] = size
+        self._entries[channel_id] = context
+        self._entries.move_to_end(channel_id)
+        self._evict_over_budget(keep=channel_id)
+
+    def pop(self, channel_id: str) -> ConversationContext | None:
+        context = self._entries.pop(channel_id, None)
+        self.total_bytes -= self._sizes.pop(channel_id, 0)
+        return context
+
+    def values(self):
+        return self._entries.values()
+
+    def items(self):
+        return self._entries.items()
+
+    def size_of(self, channel_id: str) -> int:
+        return self._sizes.get(channel_id, 0)
+
+    def _evict_over_budget(self, keep: str) -> None:
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            channel_id = next(iter(self._entries))
+            if channel_id == keep:
+                break
+            self.evicted_bytes += self._sizes.get(channel_id, 0)
+            self.evictions += 1
+            context = self.pop(channel_id)
+            if self.on_evict is not None:
+                self.on_evict(channel_id, context)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+        }
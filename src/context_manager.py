@@ -1,15 +1,41 @@
 from __future__ import annotations
 
 import asyncio
+import bisect
 import json
 import time
-from dataclasses import dataclass, asdict
+import weakref
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, TypeVar
 
 import discord
-from config import DATA_ENCRYPTION_KEY
+from config import (
+    CONTEXT_CACHE_MAX_BYTES,
+    CONTEXT_DATA_DIR,
+    CONTEXT_IO_WORKERS,
+    CONTEXT_OFFLOAD_BYTES,
+    DATA_ENCRYPTION_KEY,
+    INGEST_BATCH_DELAY_MS,
+    INGEST_BATCH_MAX_MESSAGES,
+    MANIFEST_FLUSH_DELAY_S,
+    SHUTDOWN_FLUSH_TIMEOUT_S,
+    WARM_SNAPSHOT_MAX_BYTES,
+)
+from context_cache import ContextCache, estimate_context_bytes
+from context_manifest import ContextManifest, ManifestEntry
 from crypto_utils import encrypt_json_bytes, decrypt_json_bytes
+from fs_utils import atomic_write_bytes, remove_stale_temp_files
+from metrics import (
+    CONTEXT_INGEST_BATCH_MESSAGES,
+    CONTEXT_LOAD_BYTES,
+    CONTEXT_LOAD_SECONDS,
+    CONTEXT_SAVE_BYTES,
+    CONTEXT_SAVE_SECONDS,
+)
+
+T = TypeVar("T")
 
 
 @dataclass
@@ -28,13 +54,18 @@ class ConversationMessage:
         return {"role": self.role, "content": self.content}
 
     def to_dict(self) -> dict[str, Any]:
-        return asdict(self)
+        # Every field is a scalar, so a shallow copy is as good as asdict()
+        return dict(self.__dict__)
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> ConversationMessage:
         return cls(**data)
 
 
+def _message_timestamp(message: ConversationMessage) -> float:
+    return message.timestamp
+
+
 @dataclass
 class ConversationContext:
     channel_id: str
@@ -49,12 +80,23 @@ class ConversationContext:
         if self.topic_keywords is None:
             self.topic_keywords = []
 
+    # Messages are kept sorted by timestamp so time ranges can be bisected
     def add_message(self, message: ConversationMessage) -> None:
-        self.messages.append(message)
+        if self.messages and message.timestamp < self.messages[-1].timestamp:
+            bisect.insort_right(self.messages, message, key=_message_timestamp)
+        else:
+            self.messages.append(message)
         self.last_activity = time.time()
         self.total_tokens += message.token_count
         self._update_relevance_scores()
 
+    def add_messages(self, messages: list[ConversationMessage]) -> None:
+        self.messages.extend(messages)
+        self._ensure_sorted()
+        self.last_activity = time.time()
+        self.total_tokens += sum(message.token_count for message in messages)
+        self._update_relevance_scores()
+
     def _update_relevance_scores(self) -> None:
         current_time = time.time()
 
@@ -97,9 +139,33 @@ class ConversationContext:
         self.messages = all_kept
         self.total_tokens = sum(msg.token_count for msg in self.messages)
 
+    def _ensure_sorted(self) -> None:
+        messages = self.messages
+        if any(
+            messages[i].timestamp > messages[i + 1].timestamp
+            for i in range(len(messages) - 1)
+        ):
+            messages.sort(key=_message_timestamp)
+
+    def messages_between(self, start: float, end: float) -> tuple[int, int]:
+        """Index bounds of messages with start <= timestamp < end."""
+        low = bisect.bisect_left(self.messages, start, key=_message_timestamp)
+        high = bisect.bisect_left(self.messages, end, lo=low, key=_message_timestamp)
+        return low, high
+
     def get_mistral_messages(self) -> list[dict[str, str]]:
         return [msg.to_mistral_message() for msg in self.messages]
 
+    def snapshot(self) -> ConversationContext:
+        """Cheap copy that a worker thread can serialize while this one changes.
+
+        Only the lists are copied. Messages are shared; the loop only ever
+        rewrites their relevance scores, which are recomputed on load anyway.
+        """
+        return replace(
+            self, messages=list(self.messages), topic_keywords=list(self.topic_keywords)
+        )
+
     def to_dict(self) -> dict[str, Any]:
         return {
             "channel_id": self.channel_id,
@@ -116,7 +182,7 @@ class ConversationContext:
         messages = [
             ConversationMessage.from_dict(msg_data) for msg_data in data["messages"]
         ]
-        return cls(
+        context = cls(
             channel_id=data["channel_id"],
             messages=messages,
             created_at=data["created_at"],
@@ -125,27 +191,135 @@ class ConversationContext:
             conversation_summary=data.get("conversation_summary", ""),
             topic_keywords=data.get("topic_keywords", []),
         )
+        # Files written before ordered inserts may hold out-of-order messages
+        context._ensure_sorted()
+        return context
 
 
-class ContextManager:
-    def __init__(self, data_dir: str = None):
-        if data_dir is None:
-            project_root = Path(__file__).parent.parent
-            data_dir = project_root / "data" / "conversations"
+def _write_context_file(
+    context_file: Path, context: ConversationContext, encryption_key: str | None
+) -> int:
+    # Takes a snapshot(), so building the dict can run on a worker thread too
+    plain = json.dumps(
+        context.to_dict(), separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    payload, _ = encrypt_json_bytes(plain, encryption_key)
+    atomic_write_bytes(context_file, payload)
+    return len(payload)
+
+
+def _read_context_file(
+    context_file: Path, encryption_key: str | None
+) -> tuple[ConversationContext, int]:
+    raw = context_file.read_bytes()
+    plain = decrypt_json_bytes(raw, encryption_key)
+    data = json.loads(plain.decode("utf-8"))
+    return ConversationContext.from_dict(data), len(raw)
+
+
+def _write_snapshot_file(path: Path, data: dict, encryption_key: str | None) -> int:
+    data = {**data, "contexts": [context.to_dict() for context in data["contexts"]]}
+    plain = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    payload, _ = encrypt_json_bytes(plain, encryption_key)
+    atomic_write_bytes(path, payload)
+    return len(payload)
+
+
+def _read_snapshot_file(
+    path: Path, encryption_key: str | None
+) -> tuple[list[ConversationContext], dict[str, Any]]:
+    # Read once and delete right away so a stale snapshot is never loaded twice
+    raw = path.read_bytes()
+    path.unlink(missing_ok=True)
+    data = json.loads(decrypt_json_bytes(raw, encryption_key).decode("utf-8"))
+    contexts = [ConversationContext.from_dict(ctx) for ctx in data["contexts"]]
+    return contexts, data
+
 
-        self.data_dir = Path(data_dir)
+class ContextManager:
+    def __init__(
+        self,
+        data_dir: str = None,
+        max_cache_bytes: int = None,
+        encryption_key: str | None = DATA_ENCRYPTION_KEY,
+        partition: str | None = None,
+    ):
+        # Context files may be shared by several shard processes; `partition`
+        # names this process's own manifest and warm snapshot
+        self.data_dir = Path(data_dir or CONTEXT_DATA_DIR)
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        remove_stale_temp_files(self.data_dir, min_age_s=60)
+        self.encryption_key = encryption_key
 
-        self.active_contexts: dict[str, ConversationContext] = {}
+        self.max_cache_bytes = max_cache_bytes or CONTEXT_CACHE_MAX_BYTES
+        self.active_contexts = ContextCache(
+            self.max_cache_bytes, on_evict=self._on_evict
+        )
+        # Channel -> mutation revision for contexts with changes not yet persisted
+        self.dirty_channels: dict[str, int] = {}
+        self._pending_saves: set[asyncio.Task] = set()
+        # Dirty contexts pushed out of the cache, held until their save succeeds
+        self._evicted_dirty: dict[str, ConversationContext] = {}
+        self._closed = False
+        # Passive messages waiting to be applied to their channel in one batch
+        self._ingest_buffers: dict[str, list[ConversationMessage]] = {}
+        self._ingest_timers: dict[str, asyncio.TimerHandle] = {}
+        # At most one background flush per channel; it works through full batches
+        self._ingest_tasks: dict[str, asyncio.Task] = {}
+        self.ingest_delay = INGEST_BATCH_DELAY_MS / 1000
+        self.ingest_max_messages = INGEST_BATCH_MAX_MESSAGES
+        self.known_channels: set[str] = self._scan_known_channels()
+        suffix = f".{partition}" if partition else ""
+        manifest_file = self.data_dir / f"manifest{suffix}.json"
+        self.manifest = ContextManifest(manifest_file, self.encryption_key)
+        # Picks up channels that another shard layout used to own
+        self.manifest.merge_files(
+            [
+                path
+                for path in sorted(self.data_dir.glob("manifest*.json"))
+                if path != manifest_file
+            ],
+            self.known_channels,
+        )
+        self.manifest.retain(self.known_channels)
+        self.manifest_flush_delay = MANIFEST_FLUSH_DELAY_S
+        self._manifest_flush_timer: asyncio.TimerHandle | None = None
+        self._manifest_tasks: set[asyncio.Task] = set()
+        self._manifest_lock = asyncio.Lock()
+
+        self.warm_snapshot_file = self.data_dir / f"warm_snapshot{suffix}.bin"
+        self.warm_snapshot_max_bytes = WARM_SNAPSHOT_MAX_BYTES
 
         self.max_context_tokens = 128000
-        self.max_conversations = 50
         self.conversation_timeout = 24 * 3600
         self.cleanup_interval = 3600
 
         self._cleanup_task = None
         self._cleanup_started = False
 
+        # Large contexts are (de)serialized and encrypted off the event loop.
+        # A thread pool is enough: file I/O and AES-GCM release the GIL, and it
+        # avoids pickling whole contexts across process boundaries.
+        self.offload_threshold_bytes = CONTEXT_OFFLOAD_BYTES
+        self._io_executor = ThreadPoolExecutor(
+            max_workers=CONTEXT_IO_WORKERS, thread_name_prefix="okapi-context-io"
+        )
+        # Writes in flight on the pool, so a synchronous shutdown can wait for them
+        self._io_futures: set[Future] = set()
+        # Set once the final shutdown flush starts; any later work (intake that
+        # raced the shutdown) is written inline rather than on the pool
+        self._io_closed = False
+        # Orders offloaded writes per channel so an older snapshot never lands last
+        self._save_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+        # Serializes load-or-create and mutation per channel; other channels are
+        # never blocked. Saves start right after release, before any other task
+        # runs, so their snapshots are taken in mutation order.
+        self._channel_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+
     def _start_cleanup_task(self) -> None:
         if self._cleanup_started:
             return
@@ -172,41 +346,246 @@ class ContextManager:
     def _get_context_file(self, channel_id: str) -> Path:
         return self.data_dir / f"context_{channel_id}.json"
 
-    async def _save_context(self, context: ConversationContext) -> None:
+    def _scan_known_channels(self) -> set[str]:
+        # Built once at startup so untracked channels never touch the filesystem
+        prefix, suffix = "context_", ".json"
+        return {
+            path.name[len(prefix) : -len(suffix)]
+            for path in self.data_dir.glob(f"{prefix}*{suffix}")
+        }
+
+    def is_known_channel(self, channel_id: str) -> bool:
+        return (
+            channel_id in self.active_contexts
+            or channel_id in self.known_channels
+            or channel_id in self._evicted_dirty
+        )
+
+    def _should_offload(self, approx_bytes: int) -> bool:
+        return approx_bytes >= self.offload_threshold_bytes
+
+    def _mark_dirty(self, channel_id: str) -> None:
+        self.dirty_channels[channel_id] = self.dirty_channels.get(channel_id, 0) + 1
+
+    def _on_evict(self, channel_id: str, context: ConversationContext) -> None:
+        # Never drop unsaved changes just because the cache is full
+        if channel_id not in self.dirty_channels:
+            return
+        self._evicted_dirty[channel_id] = context
+        try:
+            task = asyncio.get_running_loop().create_task(self._save_context(context))
+        except RuntimeError:
+            self._save_context_sync(context)
+            return
+        self._pending_saves.add(task)
+        task.add_done_callback(self._pending_saves.discard)
+
+    def _schedule_manifest_flush(self) -> None:
+        # One delayed write covers every change made until it fires
+        if self._io_closed:
+            # aclose() writes once more after its final flush if this raced it
+            if not self._manifest_lock.locked():
+                self.manifest.save()
+            return
+        if self._manifest_flush_timer is not None or self._closed:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.manifest.save()
+            return
+        self._manifest_flush_timer = loop.call_later(
+            self.manifest_flush_delay, self._start_manifest_flush
+        )
+
+    def _start_manifest_flush(self) -> None:
+        self._manifest_flush_timer = None
+        task = asyncio.get_running_loop().create_task(self._flush_manifest())
+        self._manifest_tasks.add(task)
+        task.add_done_callback(self._manifest_tasks.discard)
+
+    async def _flush_manifest(self) -> None:
+        # Serialized so an older snapshot can never be written last
+        async with self._manifest_lock:
+            await self.manifest.save_async(self._io_executor)
+
+    async def _run_io(
+        self,
+        offload: bool,
+        function: Callable[..., T],
+        *args,
+        executor: Executor | None = None,
+    ) -> T:
+        if not offload or self._io_closed:
+            return function(*args)
+        if executor is not None:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, function, *args
+            )
+        future = self._io_executor.submit(function, *args)
+        self._io_futures.add(future)
+        future.add_done_callback(self._io_futures.discard)
+        return await asyncio.wrap_future(future)
+
+    def _save_lock(self, channel_id: str) -> asyncio.Lock:
+        lock = self._save_locks.get(channel_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._save_locks[channel_id] = lock
+        return lock
+
+    def _channel_lock(self, channel_id: str) -> asyncio.Lock:
+        lock = self._channel_locks.get(channel_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._channel_locks[channel_id] = lock
+        return lock
+
+    async def _save_context(
+        self, context: ConversationContext, offload: bool | None = None
+    ) -> bool:
         try:
             context_file = self._get_context_file(context.channel_id)
-            plain = json.dumps(
-                context.to_dict(), separators=(",", ":"), ensure_ascii=False
-            ).encode("utf-8")
-            payload, _ = encrypt_json_bytes(plain, DATA_ENCRYPTION_KEY)
-            with open(context_file, "wb") as f:
-                f.write(payload)
+            # Snapshot on the loop thread so the worker never sees a mutating
+            # message list; serialization happens on the worker
+            snapshot = context.snapshot()
+            revision = self.dirty_channels.get(context.channel_id)
+            if offload is None:
+                offload = self._should_offload(
+                    self.active_contexts.size_of(context.channel_id)
+                    or estimate_context_bytes(context)
+                )
+            async with self._save_lock(context.channel_id):
+                started = time.perf_counter()
+                written = await self._run_io(
+                    offload,
+                    _write_context_file,
+                    context_file,
+                    snapshot,
+                    self.encryption_key,
+                )
+                CONTEXT_SAVE_SECONDS.observe(time.perf_counter() - started)
+                CONTEXT_SAVE_BYTES.observe(written)
+            self._mark_saved(context.channel_id, revision)
+            self._schedule_manifest_flush()
+            return True
+        except Exception as e:
+            print(f"Error saving context for channel {context.channel_id}: {e}")
+            return False
+
+    def _mark_saved(self, channel_id: str, revision: int | None) -> None:
+        self.known_channels.add(channel_id)
+        # A mutation that landed while the write was in flight keeps it dirty
+        if self.dirty_channels.get(channel_id) == revision:
+            self.dirty_channels.pop(channel_id, None)
+            self._evicted_dirty.pop(channel_id, None)
+
+    def _save_context_sync(self, context: ConversationContext) -> bool:
+        try:
+            revision = self.dirty_channels.get(context.channel_id)
+            _write_context_file(
+                self._get_context_file(context.channel_id),
+                context,
+                self.encryption_key,
+            )
+            self._mark_saved(context.channel_id, revision)
+            return True
         except Exception as e:
             print(f"Error saving context for channel {context.channel_id}: {e}")
+            return False
 
-    async def _load_context(self, channel_id: str) -> ConversationContext | None:
+    async def _load_context(
+        self,
+        channel_id: str,
+        offload: bool | None = None,
+        executor: Executor | None = None,
+    ) -> ConversationContext | None:
+        if channel_id not in self.known_channels:
+            return None
         try:
             context_file = self._get_context_file(channel_id)
-            if context_file.exists():
-                raw = context_file.read_bytes()
-                plain = decrypt_json_bytes(raw, DATA_ENCRYPTION_KEY)
-                data = json.loads(plain.decode("utf-8"))
-                return ConversationContext.from_dict(data)
+            if offload is None:
+                # The manifest's token total is a cheap proxy for the payload size
+                entry = self.manifest.get(channel_id)
+                offload = bool(entry) and self._should_offload(entry.total_tokens * 4)
+            started = time.perf_counter()
+            context, size = await self._run_io(
+                offload,
+                _read_context_file,
+                context_file,
+                self.encryption_key,
+                executor=executor,
+            )
+            CONTEXT_LOAD_SECONDS.observe(time.perf_counter() - started)
+            CONTEXT_LOAD_BYTES.observe(size)
+            return context
+        except FileNotFoundError:
+            self.known_channels.discard(channel_id)
         except Exception as e:
             print(f"Error loading context for channel {channel_id}: {e}")
         return None
 
+    async def peek_context(
+        self, channel_id: str, executor: Executor | None = None
+    ) -> ConversationContext | None:
+        """Read-only access for cross-channel reads: the context is not created,
+        and a load from disk is neither cached nor allowed to evict hot contexts.
+        Passive messages still waiting in the ingest buffer are not included.
+        Disk reads go to `executor` if given, instead of the shared I/O pool.
+        """
+        context = self.active_contexts.peek(channel_id)
+        if context is None:
+            context = self._evicted_dirty.get(channel_id)
+        if context is None:
+            context = await self._load_context(
+                channel_id, offload=True, executor=executor
+            )
+        return context
+
     async def get_conversation_context(
         self, channel_id: str, create_if_missing: bool = True
+    ) -> ConversationContext | None:
+        if channel_id not in self._ingest_buffers:
+            context = self.active_contexts.get(channel_id)
+            if context is not None:
+                return context
+        async with self._channel_lock(channel_id):
+            context, flushed = await self._locked_context(channel_id, create_if_missing)
+        if flushed:
+            await self._save_context(context)
+        return context
+
+    async def _locked_context(
+        self, channel_id: str, create_if_missing: bool
+    ) -> tuple[ConversationContext | None, bool]:
+        # Caller holds the channel lock. Buffered passive messages are applied
+        # first so every reader and writer sees them in arrival order.
+        batches = []
+        while batch := self._take_batch(channel_id):
+            batches.append(batch)
+        context = await self._get_or_load_context(
+            channel_id, create_if_missing or bool(batches)
+        )
+        for batch in batches:
+            self._apply_batch(context, batch)
+        return context, bool(batches)
+
+    async def _get_or_load_context(
+        self, channel_id: str, create_if_missing: bool = True
     ) -> ConversationContext | None:
         self._start_cleanup_task()
 
-        if channel_id in self.active_contexts:
-            return self.active_contexts[channel_id]
+        context = self.active_contexts.get(channel_id)
+        if context is not None:
+            return context
 
-        context = await self._load_context(channel_id)
+        context = self._evicted_dirty.get(channel_id)
+        if context is None:
+            context = await self._load_context(channel_id)
+            if context:
+                self._reconcile_manifest(context)
         if context:
-            self.active_contexts[channel_id] = context
+            self.active_contexts.put(channel_id, context)
             return context
 
         if create_if_missing:
@@ -216,29 +595,31 @@ class ContextManager:
                 created_at=time.time(),
                 last_activity=time.time(),
             )
-            self.active_contexts[channel_id] = context
+            self.active_contexts.put(channel_id, context)
             return context
 
         return None
 
+    def _reconcile_manifest(self, context: ConversationContext) -> None:
+        # The file is authoritative: an entry from a crash inside the flush
+        # window or from another shard's manifest is rebuilt from it
+        entry = self.manifest.get(context.channel_id)
+        if entry is None or entry.last_activity != context.last_activity:
+            self.manifest.update_from_context(context)
+            self._schedule_manifest_flush()
+
     async def add_user_message(
         self, channel_id: str, message: discord.Message
     ) -> ConversationContext:
-        context = await self.get_conversation_context(channel_id)
-
-        conv_message = ConversationMessage(
-            id=str(message.id),
-            author_id=str(message.author.id),
-            author_name=message.author.display_name,
-            content=message.content,
-            timestamp=message.created_at.timestamp(),
-            role="user",
-            is_bot=message.author.bot,
-            token_count=self._estimate_tokens(message.content),
-        )
-
-        context.add_message(conv_message)
-        context.prune_messages(self.max_context_tokens)
+        conv_message = self._user_message(message)
+        async with self._channel_lock(channel_id):
+            context, _ = await self._locked_context(channel_id, True)
+            message_count = len(context.messages)
+            context.add_message(conv_message)
+            context.prune_messages(self.max_context_tokens)
+            self._record_append(context, conv_message, message_count)
+            self._mark_dirty(channel_id)
+            self.active_contexts.put(channel_id, context)
         await self._save_context(context)
 
         return context
@@ -246,8 +627,6 @@ class ContextManager:
     async def add_bot_response(
         self, channel_id: str, response_content: str, response_message_id: str = None
     ) -> ConversationContext:
-        context = await self.get_conversation_context(channel_id)
-
         conv_message = ConversationMessage(
             id=response_message_id or f"bot_{int(time.time())}",
             author_id="bot",
@@ -259,12 +638,153 @@ class ContextManager:
             token_count=self._estimate_tokens(response_content),
         )
 
-        context.add_message(conv_message)
-        context.prune_messages(self.max_context_tokens)
+        async with self._channel_lock(channel_id):
+            context, _ = await self._locked_context(channel_id, True)
+            message_count = len(context.messages)
+            context.add_message(conv_message)
+            context.prune_messages(self.max_context_tokens)
+            self._record_append(context, conv_message, message_count)
+            self._mark_dirty(channel_id)
+            self.active_contexts.put(channel_id, context)
         await self._save_context(context)
 
         return context
 
+    def _user_message(self, message: discord.Message) -> ConversationMessage:
+        return ConversationMessage(
+            id=str(message.id),
+            author_id=str(message.author.id),
+            author_name=message.author.display_name,
+            content=message.content,
+            timestamp=message.created_at.timestamp(),
+            role="user",
+            is_bot=message.author.bot,
+            token_count=self._estimate_tokens(message.content),
+        )
+
+    def buffer_user_message(self, channel_id: str, message: discord.Message) -> None:
+        """Queue a passive channel message to be applied with the next batch."""
+        buffer = self._ingest_buffers.setdefault(channel_id, [])
+        buffer.append(self._user_message(message))
+        if channel_id in self._ingest_tasks:
+            # The running flush picks up full batches and re-arms the timer
+            return
+        if len(buffer) >= self.ingest_max_messages:
+            self._schedule_flush(channel_id)
+        else:
+            self._arm_flush_timer(channel_id)
+
+    def _arm_flush_timer(self, channel_id: str) -> None:
+        if self._closed:
+            # Shutting down: nothing may wait for a timer that will never fire
+            self._schedule_flush(channel_id)
+            return
+        if channel_id not in self._ingest_timers:
+            self._ingest_timers[channel_id] = asyncio.get_running_loop().call_later(
+                self.ingest_delay, self._schedule_flush, channel_id
+            )
+
+    def _schedule_flush(self, channel_id: str) -> None:
+        timer = self._ingest_timers.pop(channel_id, None)
+        if timer is not None:
+            timer.cancel()
+        if channel_id in self._ingest_tasks:
+            return
+        task = asyncio.get_running_loop().create_task(self._flush_batches(channel_id))
+        self._ingest_tasks[channel_id] = task
+
+    def _take_batch(self, channel_id: str) -> list[ConversationMessage]:
+        """Take up to one batch (the size cap) of buffered messages."""
+        buffer = self._ingest_buffers.get(channel_id)
+        if buffer and len(buffer) > self.ingest_max_messages:
+            batch = buffer[: self.ingest_max_messages]
+            del buffer[: self.ingest_max_messages]
+            return batch
+        return self._discard_buffer(channel_id)
+
+    def _discard_buffer(self, channel_id: str) -> list[ConversationMessage]:
+        timer = self._ingest_timers.pop(channel_id, None)
+        if timer is not None:
+            timer.cancel()
+        return self._ingest_buffers.pop(channel_id, [])
+
+    def _apply_batch(
+        self, context: ConversationContext, batch: list[ConversationMessage]
+    ) -> None:
+        message_count = len(context.messages)
+        context.add_messages(batch)
+        context.prune_messages(self.max_context_tokens)
+        # A channel without an entry yet is built from the context, which
+        # already holds the whole batch
+        if (
+            len(context.messages) == message_count + len(batch)
+            and self.manifest.get(context.channel_id) is not None
+        ):
+            for message in batch:
+                self.manifest.record_message(context, message)
+        else:
+            self.manifest.update_from_context(context)
+        self._mark_dirty(context.channel_id)
+        self.active_contexts.put(context.channel_id, context)
+        CONTEXT_INGEST_BATCH_MESSAGES.observe(len(batch))
+
+    async def _flush_batches(self, channel_id: str) -> None:
+        # One batch per pass, with a save in between; a partial remainder waits
+        # for the timer like any other new message
+        try:
+            while True:
+                async with self._channel_lock(channel_id):
+                    batch = self._take_batch(channel_id)
+                    if not batch:
+                        return
+                    context = await self._get_or_load_context(channel_id)
+                    self._apply_batch(context, batch)
+                await self._save_context(context)
+                if (
+                    len(self._ingest_buffers.get(channel_id, ()))
+                    < self.ingest_max_messages
+                ):
+                    break
+        except Exception as e:
+            print(f"Error flushing buffered messages for channel {channel_id}: {e}")
+        finally:
+            # Deregister before returning so a message arriving next arms a timer
+            self._ingest_tasks.pop(channel_id, None)
+        if channel_id in self._ingest_buffers:
+            self._arm_flush_timer(channel_id)
+
+    async def flush_pending(self, channel_id: str) -> None:
+        """Apply everything buffered for the channel now."""
+        if channel_id not in self._ingest_buffers:
+            return
+        try:
+            async with self._channel_lock(channel_id):
+                context, flushed = await self._locked_context(channel_id, True)
+            if flushed:
+                await self._save_context(context)
+        except Exception as e:
+            print(f"Error flushing buffered messages for channel {channel_id}: {e}")
+
+    async def flush_all_pending(self) -> None:
+        await asyncio.gather(
+            *(
+                self.flush_pending(channel_id)
+                for channel_id in list(self._ingest_buffers)
+            )
+        )
+
+    def _record_append(
+        self,
+        context: ConversationContext,
+        message: ConversationMessage,
+        previous_count: int,
+    ) -> None:
+        if len(context.messages) == previous_count + 1:
+            self.manifest.record_message(context, message)
+        else:
+            # Pruning dropped messages, so the running aggregates are stale
+            self.manifest.update_from_context(context)
+
     async def get_recent_messages(
         self, channel_id: str, limit: int = 10
     ) -> list[ConversationMessage]:
@@ -277,12 +797,49 @@ class ContextManager:
         return context.messages[-limit:] if context.messages else []
 
     async def clear_conversation(self, channel_id: str) -> None:
-        if channel_id in self.active_contexts:
-            del self.active_contexts[channel_id]
+        async with self._channel_lock(channel_id):
+            self.active_contexts.pop(channel_id)
+            self._discard_buffer(channel_id)
+            self.dirty_channels.pop(channel_id, None)
+            self._evicted_dirty.pop(channel_id, None)
+
+            # Queued saves finish first so none can recreate the file afterwards
+            async with self._save_lock(channel_id):
+                self._get_context_file(channel_id).unlink(missing_ok=True)
+            self.known_channels.discard(channel_id)
+            self.manifest.remove(channel_id)
+            self._schedule_manifest_flush()
+
+    async def truncate_conversation(
+        self, channel_id: str, count: int
+    ) -> ConversationContext | None:
+        async with self._channel_lock(channel_id):
+            context, _ = await self._locked_context(channel_id, False)
+            if not context:
+                return None
+
+            context.messages = context.messages[:-count]
+            context.total_tokens = sum(msg.token_count for msg in context.messages)
+            self.manifest.update_from_context(context)
+            self._mark_dirty(channel_id)
+            self.active_contexts.put(channel_id, context)
+        await self._save_context(context)
+        return context
+
+    async def get_channel_stats(self, channel_id: str) -> ManifestEntry | None:
+        entry = self.manifest.get(channel_id)
+        if entry is not None:
+            return entry
 
-        context_file = self._get_context_file(channel_id)
-        if context_file.exists():
-            context_file.unlink()
+        # Contexts persisted before the manifest existed are backfilled once
+        context = await self.get_conversation_context(
+            channel_id, create_if_missing=False
+        )
+        if not context:
+            return None
+        self.manifest.update_from_context(context)
+        self._schedule_manifest_flush()
+        return self.manifest.get(channel_id)
 
     async def _cleanup_old_conversations(self) -> None:
         current_time = time.time()
@@ -290,57 +847,226 @@ class ContextManager:
         to_remove = []
         for channel_id, context in self.active_contexts.items():
             if current_time - context.last_activity > self.conversation_timeout:
-                to_remove.append(channel_id)
-
-        for channel_id in to_remove:
-            await self._save_context(self.active_contexts[channel_id])
-            del self.active_contexts[channel_id]
-
-        if len(self.active_contexts) > self.max_conversations:
-            sorted_contexts = sorted(
-                self.active_contexts.items(), key=lambda x: x[1].last_activity
-            )
-
-            to_archive = len(self.active_contexts) - self.max_conversations
-            for channel_id, context in sorted_contexts[:to_archive]:
-                await self._save_context(context)
-                del self.active_contexts[channel_id]
-
+                to_remove.append((channel_id, context))
+
+        for channel_id, context in to_remove:
+            async with self._channel_lock(channel_id):
+                # Skip channels that were replaced or touched while we waited
+                if self.active_contexts.peek(channel_id) is not context or (
+                    channel_id in self._ingest_buffers
+                ):
+                    continue
+                # Keep contexts whose save failed so the next pass can retry them
+                if channel_id in self.dirty_channels and not await self._save_context(
+                    context
+                ):
+                    continue
+                self.active_contexts.pop(channel_id)
+
+        cache_stats = self.active_contexts.stats()
         print(
-            f"Context cleanup completed. Active conversations: {len(self.active_contexts)}"
+            f"Context cleanup completed. Active conversations: {cache_stats['entries']}, "
+            f"cached bytes: {cache_stats['bytes']}/{cache_stats['max_bytes']}, "
+            f"evictions: {cache_stats['evictions']}"
         )
 
+    def get_cache_stats(self) -> dict[str, int]:
+        return self.active_contexts.stats()
+
     async def get_conversation_summary(self, channel_id: str) -> str:
-        context = await self.get_conversation_context(
-            channel_id, create_if_missing=False
-        )
-        if not context:
+        stats = await self.get_channel_stats(channel_id)
+        if not stats:
             return "No conversation found"
 
-        message_count = len(context.messages)
-        user_messages = sum(1 for msg in context.messages if not msg.is_bot)
-        bot_messages = sum(1 for msg in context.messages if msg.is_bot)
-
-        age_hours = (time.time() - context.created_at) / 3600
-        inactive_hours = (time.time() - context.last_activity) / 3600
+        age_hours = (time.time() - stats.created_at) / 3600
+        inactive_hours = (time.time() - stats.last_activity) / 3600
 
         return (
             f"Channel: {channel_id}\n"
-            f"Messages: {message_count} ({user_messages} user, {bot_messages} bot)\n"
-            f"Tokens: {context.total_tokens}\n"
+            f"Messages: {stats.message_count} ({stats.user_messages} user, {stats.bot_messages} bot)\n"
+            f"Tokens: {stats.total_tokens}\n"
             f"Age: {age_hours:.1f}h, Last activity: {inactive_hours:.1f}h ago"
         )
 
-    def shutdown(self) -> None:
+    def _dirty_contexts(self) -> list[ConversationContext]:
+        contexts = dict(self._evicted_dirty)
+        for channel_id, context in self.active_contexts.items():
+            if channel_id in self.dirty_channels:
+                contexts[channel_id] = context
+        return list(contexts.values())
+
+    async def aclose(self, timeout: float = SHUTDOWN_FLUSH_TIMEOUT_S) -> None:
+        """Flush unsaved contexts in parallel on the I/O pool within a deadline."""
+        if self._closed:
+            return
+        self._closed = True
         if self._cleanup_task:
             self._cleanup_task.cancel()
 
-        import json
+        started = time.perf_counter()
+        deadline = started + timeout
 
-        for context in self.active_contexts.values():
+        def remaining() -> float:
+            return max(0.0, deadline - time.perf_counter())
+
+        try:
+            await asyncio.wait_for(self.flush_all_pending(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print("Timed out applying buffered messages during shutdown")
+        saves = [
+            asyncio.ensure_future(self._save_context(context, offload=True))
+            for context in self._dirty_contexts()
+        ]
+        saves.extend(self._pending_saves)
+        saves.extend(self._ingest_tasks.values())
+        if saves:
+            done, pending = await asyncio.wait(saves, timeout=remaining())
+            for task in pending:
+                task.cancel()
+            print(
+                f"Flushed {len(done)}/{len(saves)} dirty contexts in "
+                f"{time.perf_counter() - started:.2f}s"
+                + (f", {len(pending)} abandoned at deadline" if pending else "")
+            )
+        # Gateway events keep arriving until the bot disconnects; from here on
+        # they are applied and written straight away instead of on the pool
+        self._io_closed = True
+        if self._manifest_flush_timer is not None:
+            self._manifest_flush_timer.cancel()
+            self._manifest_flush_timer = None
+        try:
+            await asyncio.wait_for(self._flush_manifest(), timeout=remaining())
+        except asyncio.TimeoutError:
+            print("Timed out writing the context manifest during shutdown")
+        # Picks up saves that landed while the final flush was running
+        self.manifest.save()
+        # The snapshot is only an optimization, so it gets whatever time is left
+        snapshot = self._warm_snapshot_data() if remaining() > 0 else None
+        if snapshot is not None:
+            try:
+                await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        self._io_executor,
+                        _write_snapshot_file,
+                        self.warm_snapshot_file,
+                        snapshot,
+                        self.encryption_key,
+                    ),
+                    timeout=remaining(),
+                )
+            except asyncio.TimeoutError:
+                print("Timed out writing the warm snapshot during shutdown")
+            except Exception as e:
+                print(f"Error writing warm snapshot: {e}")
+        # Queued work is dropped and running writes (all atomic) finish on their
+        # own threads, so the loop is never blocked past the deadline
+        self._io_executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, timeout: float = SHUTDOWN_FLUSH_TIMEOUT_S) -> None:
+        """Synchronous fallback for when no event loop is available."""
+        if self._closed:
+            return
+        self._closed = True
+        self._io_closed = True
+        if self._cleanup_task:
+            self._cleanup_task.cancel()
+        # Running writes must land before ours so an older snapshot is not last,
+        # but only for as long as aclose() would have waited
+        self._io_executor.shutdown(wait=False, cancel_futures=True)
+        _, pending = wait(list(self._io_futures), timeout=timeout)
+        if pending:
+            print(f"Abandoned {len(pending)} context writes still running at shutdown")
+
+        for channel_id in list(self._ingest_buffers):
+            batch = self._discard_buffer(channel_id)
+            context = self.active_contexts.get(channel_id) or self._evicted_dirty.get(
+                channel_id
+            )
+            if context is None:
+                print(
+                    f"Dropped {len(batch)} buffered messages for channel {channel_id}"
+                )
+                continue
+            self._apply_batch(context, batch)
+
+        for context in self._dirty_contexts():
+            self._save_context_sync(context)
+        if self._manifest_flush_timer is not None:
+            self._manifest_flush_timer.cancel()
+            self._manifest_flush_timer = None
+        self.manifest.save()
+        snapshot = self._warm_snapshot_data()
+        if snapshot is not None:
             try:
-                context_file = self._get_context_file(context.channel_id)
-                with open(context_file, "w") as f:
-                    json.dump(context.to_dict(), f, indent=2)
+                _write_snapshot_file(
+                    self.warm_snapshot_file, snapshot, self.encryption_key
+                )
             except Exception as e:
-                print(f"Error saving context for channel {context.channel_id}: {e}")
+                print(f"Error writing warm snapshot: {e}")
+
+    def _warm_snapshot_data(self) -> dict[str, Any] | None:
+        if self.warm_snapshot_max_bytes <= 0:
+            return None
+        hottest, budget = [], self.warm_snapshot_max_bytes
+        # Walk from most to least recently used until the byte budget is spent
+        for channel_id in reversed(list(self.active_contexts)):
+            size = self.active_contexts.size_of(channel_id)
+            if size > budget:
+                break
+            # Unsaved contexts differ from disk and are left to a normal load
+            if channel_id in self.dirty_channels:
+                continue
+            budget -= size
+            hottest.append(self.active_contexts.peek(channel_id))
+        if not hottest:
+            return None
+        return {
+            "version": 1,
+            "written_at": time.time(),
+            # Coldest first so replaying put() rebuilds the same LRU order;
+            # serialized later by _write_snapshot_file, off the loop
+            "contexts": [context.snapshot() for context in reversed(hottest)],
+            "cache_stats": self.active_contexts.stats(),
+        }
+
+    async def warm_start(self) -> int:
+        """Load the shutdown snapshot into the cache; returns contexts restored."""
+        if not self.warm_snapshot_file.exists():
+            return 0
+        started = time.perf_counter()
+        try:
+            contexts, data = await asyncio.get_running_loop().run_in_executor(
+                self._io_executor,
+                _read_snapshot_file,
+                self.warm_snapshot_file,
+                self.encryption_key,
+            )
+        except Exception as e:
+            print(f"Ignoring unreadable warm snapshot: {e}")
+            return 0
+
+        restored = 0
+        for context in contexts:
+            channel_id = context.channel_id
+            entry = self.manifest.get(channel_id)
+            # Skip anything cleared or touched since startup, or changed after
+            # the snapshot; the startup scan of the store stays authoritative
+            if (
+                channel_id in self.active_contexts
+                or channel_id in self._ingest_buffers
+                or channel_id not in self.known_channels
+                or entry is None
+                or entry.last_activity != context.last_activity
+            ):
+                continue
+            self.active_contexts.put(channel_id, context)
+            restored += 1
+
+        previous = data.get("cache_stats", {})
+        print(
+            f"Warm start restored {restored}/{len(contexts)} contexts in "
+            f"{time.perf_counter() - started:.2f}s (previous run: "
+            f"{previous.get('hits', 0)} hits, {previous.get('misses', 0)} misses, "
+            f"{previous.get('evictions', 0)} evictions)"
+        )
+        return restored
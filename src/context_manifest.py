@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from crypto_utils import encrypt_json_bytes, decrypt_json_bytes
+from fs_utils import atomic_write_bytes
+
+if TYPE_CHECKING:
+    from context_manager import ConversationContext, ConversationMessage
+
+
+@dataclass
+class ManifestEntry:
+    channel_id: str
+    created_at: float
+    last_activity: float
+    message_count: int = 0
+    user_messages: int = 0
+    bot_messages: int = 0
+    total_tokens: int = 0
+    user_tokens: int = 0
+    bot_tokens: int = 0
+
+    def record_message(self, message: ConversationMessage) -> None:
+        self.message_count += 1
+        self.total_tokens += message.token_count
+        if message.is_bot:
+            self.bot_messages += 1
+            self.bot_tokens += message.token_count
+        else:
+            self.user_messages += 1
+            self.user_tokens += message.token_count
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> ManifestEntry:
+        return cls(**data)
+
+    @classmethod
+    def from_context(cls, context: ConversationContext) -> ManifestEntry:
+        entry = cls(
+            channel_id=context.channel_id,
+            created_at=context.created_at,
+            last_activity=context.last_activity,
+        )
+        for msg in context.messages:
+            entry.record_message(msg)
+        entry.total_tokens = context.total_tokens
+        return entry
+
+
+class ContextManifest:
+    """Encrypted per-channel aggregates so stats never need a full context load."""
+
+    def __init__(self, path: Path, encryption_key: str | None):
+        self.path = Path(path)
+        self.encryption_key = encryption_key
+        self.entries: dict[str, ManifestEntry] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            raw = self.path.read_bytes()
+        except FileNotFoundError:
+            return
+        try:
+            plain = decrypt_json_bytes(raw, self.encryption_key)
+            data = json.loads(plain.decode("utf-8"))
+            self.entries = {
+                entry["channel_id"]: ManifestEntry.from_dict(entry)
+                for entry in data.get("channels", [])
+            }
+        except Exception as e:
+            print(f"Error loading context manifest, rebuilding lazily: {e}")
+            self.entries = {}
+
+    def merge_files(self, paths: list[Path], channel_ids: set[str]) -> None:
+        """Adopt entries for `channel_ids` from other processes' manifests,
+        keeping whichever copy of each entry saw the latest activity."""
+        for path in paths:
+            other = ContextManifest(path, self.encryption_key)
+            for channel_id, entry in other.entries.items():
+                if channel_id not in channel_ids:
+                    continue
+                current = self.entries.get(channel_id)
+                if current is None or entry.last_activity > current.last_activity:
+                    self.entries[channel_id] = entry
+                    self._dirty = True
+
+    def retain(self, channel_ids: set[str]) -> None:
+        """Drop entries for channels whose context file no longer exists."""
+        for channel_id in [c for c in self.entries if c not in channel_ids]:
+            del self.entries[channel_id]
+            self._dirty = True
+
+    def get(self, channel_id: str) -> ManifestEntry | None:
+        return self.entries.get(channel_id)
+
+    def record_message(
+        self, context: ConversationContext, message: ConversationMessage
+    ) -> None:
+        entry = self.entries.get(context.channel_id)
+        if entry is None:
+            self.update_from_context(context)
+            return
+        entry.record_message(message)
+        entry.last_activity = context.last_activity
+        self._dirty = True
+
+    def update_from_context(self, context: ConversationContext) -> None:
+        self.entries[context.channel_id] = ManifestEntry.from_context(context)
+        self._dirty = True
+
+    def remove(self, channel_id: str) -> None:
+        if self.entries.pop(channel_id, None) is not None:
+            self._dirty = True
+
+    def _snapshot(self) -> list[dict[str, Any]]:
+        # Taken on the caller's thread; entries keep changing while we write
+        self._dirty = False
+        return [entry.to_dict() for entry in self.entries.values()]
+
+    def _write(self, channels: list[dict[str, Any]]) -> None:
+        plain = json.dumps({"channels": channels}, separators=(",", ":")).encode(
+            "utf-8"
+        )
+        payload, _ = encrypt_json_bytes(plain, self.encryption_key)
+        atomic_write_bytes(self.path, payload)
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        try:
+            self._write(self._snapshot())
+        except Exception as e:
+            self._dirty = True
+            print(f"Error saving context manifest: {e}")
+
+    async def save_async(self, executor: Executor) -> None:
+        """Encode and write on `executor`; only the snapshot runs on the loop."""
+        if not self._dirty:
+            return
+        channels = self._snapshot()
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                executor, self._write, channels
+            )
+        except Exception as e:
+            self._dirty = True
+            print(f"Error saving context manifest: {e}")
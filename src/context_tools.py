@@ -1,82 +1,237 @@
 from __future__ import annotations
 
+import asyncio
+import bisect
+import heapq
 import json
-from typing import Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import datetime, timezone
+from itertools import islice
+from typing import Any
 
 import discord
 
+from config import (
+    GUILD_SEARCH_CHANNEL_TIMEOUT_S,
+    GUILD_SEARCH_CONCURRENCY,
+    GUILD_SEARCH_TIMEOUT_S,
+    TOOL_OUTPUT_MAX_MESSAGE_CHARS,
+    TOOL_OUTPUT_TOKEN_BUDGET,
+)
 from context_manager import ContextManager, ConversationMessage
-
-
-class ContextTools:
-    def __init__(self, context_manager: ContextManager):
-        self.context_manager = context_manager
-
-    def get_tool_definitions(self) -> list[dict[str, Any]]:
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "fetch_recent_messages",
-                    "description": "Fetch recent conversation messages when the user asks a follow-up question, references 'earlier', 'before', 'you said', or when context is clearly needed to answer. Do NOT use for simple standalone questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "limit": {
-                                "type": "integer",
-                                "description": "Number of recent messages to fetch (max 20)",
-                                "minimum": 1,
-                                "maximum": 20,
-                                "default": 10,
-                            },
-                            "include_bot_messages": {
-                                "type": "boolean",
-                                "description": "Whether to include bot's own messages",
-                                "default": True,
-                            },
+from metrics import GUILD_SEARCH_CHANNELS, TOOL_EXECUTION_SECONDS
+from prompts import register_static
+from tool_budget import ToolOutputBudgeter
+
+
+FETCH_MESSAGES_IN_RANGE_TOOL: dict[str, Any] = {
+    "type": "function",
+    "function": {
+        "name": "fetch_messages_in_range",
+        "description": "Fetch messages sent within a time window when the user refers to a specific time (e.g. 'yesterday afternoon', 'this morning', 'last Friday'). Work out the window from the current date and time. Results come in pages; if a page ends with a cursor, call again with the same start, end and that cursor to read more.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "start": {
+                    "type": "string",
+                    "description": "Start of the window, ISO 8601 (e.g. 2025-01-31T13:00:00Z); UTC if no offset is given",
+                },
+                "end": {
+                    "type": "string",
+                    "description": "End of the window (exclusive), ISO 8601; defaults to now",
+                },
+                "cursor": {
+                    "type": "string",
+                    "description": "Cursor from the previous page, to continue after it",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of messages per page (max 50)",
+                    "minimum": 1,
+                    "maximum": 50,
+                    "default": 25,
+                },
+                "include_bot_messages": {
+                    "type": "boolean",
+                    "description": "Whether to include bot's own messages",
+                    "default": True,
+                },
+            },
+            "required": ["start"],
+        },
+    },
+}
+
+TOOL_DEFINITIONS: list[dict[str, Any]] = register_static(
+    [
+        {
+            "type": "function",
+            "function": {
+                "name": "fetch_recent_messages",
+                "description": "Fetch recent conversation messages when the user asks a follow-up question, references 'earlier', 'before', 'you said', or when context is clearly needed to answer. Do NOT use for simple standalone questions.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "limit": {
+                            "type": "integer",
+                            "description": "Number of recent messages to fetch (max 20)",
+                            "minimum": 1,
+                            "maximum": 20,
+                            "default": 10,
+                        },
+                        "include_bot_messages": {
+                            "type": "boolean",
+                            "description": "Whether to include bot's own messages",
+                            "default": True,
                         },
                     },
                 },
             },
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_conversation_history",
-                    "description": "Search conversation history for specific topics or keywords when the user explicitly asks about past discussions (e.g., 'what did we talk about regarding X'). Use only when searching past conversation, not for current questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "keywords": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "Keywords to search for in message content",
-                            },
-                            "author_name": {
-                                "type": "string",
-                                "description": "Filter messages by specific author name",
-                            },
-                            "limit": {
-                                "type": "integer",
-                                "description": "Maximum number of messages to return",
-                                "minimum": 1,
-                                "maximum": 15,
-                                "default": 5,
-                            },
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "search_conversation_history",
+                "description": "Search conversation history for specific topics or keywords when the user explicitly asks about past discussions (e.g., 'what did we talk about regarding X'). Use only when searching past conversation, not for current questions.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "keywords": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Keywords to search for in message content",
+                        },
+                        "author_name": {
+                            "type": "string",
+                            "description": "Filter messages by specific author name",
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Maximum number of messages to return",
+                            "minimum": 1,
+                            "maximum": 15,
+                            "default": 5,
+                        },
+                        "scope": {
+                            "type": "string",
+                            "enum": ["channel", "guild"],
+                            "description": "'channel' searches this channel; use 'guild' only when the user asks about discussions in other channels of this server (only channels every member can read are searched)",
+                            "default": "channel",
                         },
-                        "required": [],
                     },
+                    "required": [],
                 },
             },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_conversation_summary",
-                    "description": "Get a summary of the current conversation including message counts and activity",
-                    "parameters": {"type": "object", "properties": {}, "required": []},
-                },
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "get_conversation_summary",
+                "description": "Get a summary of the current conversation including message counts and activity",
+                "parameters": {"type": "object", "properties": {}, "required": []},
             },
-        ]
+        },
+        FETCH_MESSAGES_IN_RANGE_TOOL,
+    ]
+)
+
+# Offered again after a range page so the model can follow its cursor
+PAGING_TOOL_DEFINITIONS: list[dict[str, Any]] = register_static(
+    [FETCH_MESSAGES_IN_RANGE_TOOL]
+)
+
+
+def _parse_timestamp(value: str) -> float:
+    value = value.strip()
+    if value[-1:] in ("Z", "z"):
+        value = value[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _format_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+def _matches_search(
+    msg: ConversationMessage, keywords: list[str], author_name: str
+) -> bool:
+    if author_name and author_name not in msg.author_name.lower():
+        return False
+    if keywords:
+        content_lower = msg.content.lower()
+        return any(keyword.lower() in content_lower for keyword in keywords)
+    return True
+
+
+def _search_rank(msg: ConversationMessage) -> tuple[float, float]:
+    return (msg.relevance_score, msg.timestamp)
+
+
+def _can_read_history(channel: Any, member: discord.Member | discord.Role) -> bool:
+    if not hasattr(channel, "permissions_for"):
+        return False
+    permissions = channel.permissions_for(member)
+    if not (permissions.view_channel and permissions.read_message_history):
+        return False
+    # Threads inherit the parent's permissions, which say nothing about who
+    # was added to a private thread
+    if isinstance(channel, discord.Thread) and channel.is_private():
+        return (
+            permissions.manage_threads
+            or channel.owner_id == member.id
+            or any(thread_member.id == member.id for thread_member in channel.members)
+        )
+    return True
+
+
+def _resume_index(
+    messages: list[ConversationMessage],
+    cursor: str,
+    low: int,
+    high: int,
+) -> int:
+    # Cursors are "timestamp:message_id" of the last message already returned
+    timestamp_raw, _, message_id = cursor.partition(":")
+    timestamp = float(timestamp_raw)
+    start = bisect.bisect_left(
+        messages, timestamp, lo=low, hi=high, key=lambda msg: msg.timestamp
+    )
+    end = bisect.bisect_right(
+        messages, timestamp, lo=start, hi=high, key=lambda msg: msg.timestamp
+    )
+    # Several messages can share a timestamp; resume right after the cursor's one
+    for index in range(start, end):
+        if messages[index].id == message_id:
+            return index + 1
+    return end
+
+
+class ContextTools:
+    def __init__(self, context_manager: ContextManager):
+        self.context_manager = context_manager
+        self.tool_names = frozenset(
+            tool["function"]["name"] for tool in self.get_tool_definitions()
+        )
+        self.budgeter = ToolOutputBudgeter(
+            TOOL_OUTPUT_TOKEN_BUDGET,
+            TOOL_OUTPUT_MAX_MESSAGE_CHARS,
+            context_manager._estimate_tokens,
+        )
+        # Guild-wide searches read many channels at once; on their own pool
+        # they neither queue behind nor delay /ask context loads and saves
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=GUILD_SEARCH_CONCURRENCY,
+            thread_name_prefix="okapi-guild-search",
+        )
+
+    def get_tool_definitions(self) -> list[dict[str, Any]]:
+        # Shared and pre-encoded; callers must not mutate it
+        return TOOL_DEFINITIONS
 
     async def execute_tool(
         self,
@@ -84,20 +239,35 @@ class ContextTools:
         channel_id: str,
         arguments: dict[str, Any],
         discord_channel: discord.TextChannel = None,
-    ) -> str:
+        requester: discord.abc.User = None,
+    ) -> tuple[str, str | None]:
+        """Run a tool and return its output plus the cursor of the next page.
+
+        The cursor is None unless a paged tool has more results to give.
+        """
         try:
             if tool_name == "fetch_recent_messages":
-                return await self._fetch_recent_messages(
+                result = await self._fetch_recent_messages(
                     channel_id, arguments, discord_channel
                 )
             elif tool_name == "search_conversation_history":
-                return await self._search_conversation_history(channel_id, arguments)
+                if arguments.get("scope") == "guild":
+                    result = await self._search_guild_history(
+                        arguments, discord_channel, requester
+                    )
+                else:
+                    result = await self._search_conversation_history(
+                        channel_id, arguments
+                    )
             elif tool_name == "get_conversation_summary":
-                return await self._get_conversation_summary(channel_id)
+                result = await self._get_conversation_summary(channel_id)
+            elif tool_name == "fetch_messages_in_range":
+                return await self._fetch_messages_in_range(channel_id, arguments)
             else:
-                return f"Unknown tool: {tool_name}"
+                result = f"Unknown tool: {tool_name}"
+            return result, None
         except Exception as e:
-            return f"Error executing {tool_name}: {str(e)}"
+            return f"Error executing {tool_name}: {str(e)}", None
 
     async def _fetch_recent_messages(
         self,
@@ -148,14 +318,12 @@ class ContextTools:
         if not context_messages:
             return "No recent messages found in conversation history."
 
-        formatted_messages = []
-        for msg in context_messages[-limit:]:
-            timestamp = datetime.fromtimestamp(msg.timestamp, tz=timezone.utc)
-            formatted_messages.append(
-                f"[{timestamp.strftime('%H:%M')}] {msg.author_name}: {msg.content}"
-            )
-
-        return "Recent conversation history:\n" + "\n".join(formatted_messages)
+        return self.budgeter.render_messages(
+            "fetch_recent_messages",
+            "Recent conversation history:\n",
+            context_messages[-limit:],
+            "%H:%M",
+        )
 
     async def _search_conversation_history(
         self, channel_id: str, arguments: dict[str, Any]
@@ -170,53 +338,227 @@ class ContextTools:
         if not context or not context.messages:
             return "No conversation history found."
 
-        matching_messages = []
-
-        for msg in context.messages:
-            matches = True
-
-            if author_name and author_name not in msg.author_name.lower():
-                matches = False
-
-            if keywords and matches:
-                content_lower = msg.content.lower()
-                if not any(keyword.lower() in content_lower for keyword in keywords):
-                    matches = False
+        matching_messages = [
+            msg
+            for msg in context.messages
+            if _matches_search(msg, keywords, author_name)
+        ]
 
-            if matches:
-                matching_messages.append(msg)
+        search_info = []
+        if keywords:
+            search_info.append(f"keywords: {', '.join(keywords)}")
+        if author_name:
+            search_info.append(f"author: {author_name}")
 
         if not matching_messages:
-            search_desc = []
-            if keywords:
-                search_desc.append(f"keywords: {', '.join(keywords)}")
-            if author_name:
-                search_desc.append(f"author: {author_name}")
+            return f"No messages found matching {', '.join(search_info)}."
 
-            return f"No messages found matching {', '.join(search_desc)}."
+        matching_messages.sort(key=_search_rank, reverse=True)
+        top_messages = matching_messages[:limit]
 
-        matching_messages.sort(
-            key=lambda x: (x.relevance_score, x.timestamp), reverse=True
+        return self.budgeter.render_messages(
+            "search_conversation_history",
+            f"Found {len(matching_messages)} messages matching {', '.join(search_info)}:\n\n",
+            top_messages,
+            "%Y-%m-%d %H:%M",
+            keep_newest=False,
         )
-        top_messages = matching_messages[:limit]
 
-        formatted_messages = []
-        for msg in top_messages:
-            timestamp = datetime.fromtimestamp(msg.timestamp, tz=timezone.utc)
-            formatted_messages.append(
-                f"[{timestamp.strftime('%Y-%m-%d %H:%M')}] {msg.author_name}: {msg.content}"
+    async def _search_guild_history(
+        self,
+        arguments: dict[str, Any],
+        discord_channel: discord.TextChannel = None,
+        requester: discord.abc.User = None,
+    ) -> str:
+        keywords = arguments.get("keywords", [])
+        author_name = arguments.get("author_name", "").lower()
+        limit = min(arguments.get("limit", 5), 15)
+
+        guild = getattr(discord_channel, "guild", None)
+        if guild is None or not isinstance(requester, discord.Member):
+            return "Server-wide search is only available inside a server."
+
+        # The answer is posted where anyone in this channel can read it, so
+        # besides the requester's own access, a channel is only searched if
+        # everyone in the server can read it (or it is this very channel)
+        destination_id = getattr(discord_channel, "id", None)
+        channels = {}
+        for channel in [*guild.channels, *guild.threads]:
+            channel_id = str(channel.id)
+            if not self.context_manager.is_known_channel(channel_id):
+                continue
+            if not _can_read_history(channel, requester):
+                GUILD_SEARCH_CHANNELS.inc(outcome="forbidden")
+            elif channel.id != destination_id and not _can_read_history(
+                channel, guild.default_role
+            ):
+                GUILD_SEARCH_CHANNELS.inc(outcome="private")
+            else:
+                channels[channel_id] = channel
+        if not channels:
+            return "No conversation history found in channels open to this server."
+
+        semaphore = asyncio.Semaphore(GUILD_SEARCH_CONCURRENCY)
+
+        async def search_channel(
+            channel_id: str,
+        ) -> tuple[int, list[ConversationMessage]]:
+            async with semaphore:
+                context = await asyncio.wait_for(
+                    self.context_manager.peek_context(
+                        channel_id, self._search_executor
+                    ),
+                    GUILD_SEARCH_CHANNEL_TIMEOUT_S,
+                )
+            if not context:
+                return 0, []
+            matches = [
+                msg
+                for msg in context.messages
+                if _matches_search(msg, keywords, author_name)
+            ]
+            return len(matches), heapq.nlargest(limit, matches, key=_search_rank)
+
+        tasks = {
+            asyncio.create_task(search_channel(channel_id)): channel_id
+            for channel_id in channels
+        }
+        # Whatever has finished by the deadline is returned; the rest is dropped
+        done, pending = await asyncio.wait(tasks, timeout=GUILD_SEARCH_TIMEOUT_S)
+        for task in pending:
+            task.cancel()
+        GUILD_SEARCH_CHANNELS.inc(len(pending), outcome="deadline")
+
+        total_matches = 0
+        skipped = len(pending)
+        ranked: list[list[ConversationMessage]] = []
+        for task in done:
+            channel = channels[tasks[task]]
+            try:
+                match_count, top = task.result()
+            except asyncio.TimeoutError:
+                GUILD_SEARCH_CHANNELS.inc(outcome="timeout")
+                skipped += 1
+                continue
+            except Exception as e:
+                print(f"Error searching channel {channel.id}: {e}")
+                GUILD_SEARCH_CHANNELS.inc(outcome="error")
+                skipped += 1
+                continue
+            GUILD_SEARCH_CHANNELS.inc(outcome="searched")
+            total_matches += match_count
+            ranked.append(
+                [
+                    replace(msg, author_name=f"{msg.author_name} in #{channel.name}")
+                    for msg in top
+                ]
             )
 
+        # Each channel's list is already ranked, so a k-way merge finds the top k
+        top_messages = list(
+            islice(heapq.merge(*ranked, key=_search_rank, reverse=True), limit)
+        )
+
         search_info = []
         if keywords:
             search_info.append(f"keywords: {', '.join(keywords)}")
         if author_name:
             search_info.append(f"author: {author_name}")
+        searched = len(channels) - skipped
+        partial = (
+            f" ({skipped} channels could not be searched in time)" if skipped else ""
+        )
 
-        return (
-            f"Found {len(matching_messages)} messages matching {', '.join(search_info)}:\n\n"
-            + "\n".join(formatted_messages)
+        if not top_messages:
+            return (
+                f"No messages found matching {', '.join(search_info)} "
+                f"in {searched} channels{partial}."
+            )
+        return self.budgeter.render_messages(
+            "search_conversation_history",
+            f"Found {total_matches} messages matching {', '.join(search_info)} "
+            f"across {searched} channels{partial}:\n\n",
+            top_messages,
+            "%Y-%m-%d %H:%M",
+            keep_newest=False,
+        )
+
+    async def _fetch_messages_in_range(
+        self, channel_id: str, arguments: dict[str, Any]
+    ) -> tuple[str, str | None]:
+        try:
+            start = _parse_timestamp(arguments.get("start") or "")
+            end = (
+                _parse_timestamp(arguments["end"])
+                if arguments.get("end")
+                else time.time()
+            )
+        except ValueError:
+            return (
+                "Invalid time range. Use ISO 8601 times such as 2025-01-31T13:00:00Z.",
+                None,
+            )
+        if end <= start:
+            return "The end of the time range must be after its start.", None
+        limit = max(1, min(arguments.get("limit", 25), 50))
+        include_bot_messages = arguments.get("include_bot_messages", True)
+        cursor = arguments.get("cursor")
+
+        context = await self.context_manager.get_conversation_context(
+            channel_id, create_if_missing=False
         )
+        if not context or not context.messages:
+            return "No conversation history found.", None
+
+        # Bisect and slice without awaiting so the list cannot change underneath
+        messages = context.messages
+        low, high = context.messages_between(start, end)
+        if cursor:
+            try:
+                low = _resume_index(messages, cursor, low, high)
+            except ValueError:
+                return "Invalid cursor. Pass the cursor exactly as returned.", None
+        candidates = (
+            messages[index]
+            for index in range(low, high)
+            if include_bot_messages or not messages[index].is_bot
+        )
+        page = list(islice(candidates, limit + 1))
+        more_after_page = len(page) > limit
+        page = page[:limit]
+
+        window = f"{_format_timestamp(start)} and {_format_timestamp(end)} UTC"
+        if not page:
+            if cursor:
+                return f"No more messages between {window}.", None
+            return f"No messages found between {window}.", None
+
+        def next_cursor(count: int) -> str | None:
+            if count == len(page) and not more_after_page:
+                return None
+            last = page[count - 1]
+            return f"{last.timestamp!r}:{last.id}"
+
+        def footer(count: int) -> str:
+            # The count is what this page shows, after bot filtering and trimming
+            shown = f"{count} message{'s' if count != 1 else ''} shown"
+            cursor = next_cursor(count)
+            if cursor is None:
+                return f"\n\n({shown}. End of range.)"
+            return (
+                f"\n\n({shown}. More messages in this range. To continue, call "
+                f'again with cursor "{cursor}".)'
+            )
+
+        continued = " (continued)" if cursor else ""
+        text, count = self.budgeter.render_page(
+            "fetch_messages_in_range",
+            f"Messages between {window}{continued}:\n",
+            page,
+            "%Y-%m-%d %H:%M",
+            footer,
+        )
+        return text, next_cursor(count)
 
     async def _get_conversation_summary(self, channel_id: str) -> str:
         summary = await self.context_manager.get_conversation_summary(channel_id)
@@ -232,8 +574,14 @@ async def process_tool_calls(
     context_tools: ContextTools,
     channel_id: str,
     discord_channel: discord.TextChannel = None,
-) -> list[dict[str, Any]]:
+    requester: discord.abc.User = None,
+) -> tuple[list[dict[str, Any]], bool]:
+    """Run the model's tool calls and build the tool messages to send back.
+
+    Also returns whether any paged tool reported more results behind a cursor.
+    """
     tool_results = []
+    has_more_pages = False
 
     for tool_call in tool_calls:
         try:
@@ -253,8 +601,19 @@ async def process_tool_calls(
             else:
                 arguments = {}
 
-            result = await context_tools.execute_tool(
-                function_name, channel_id, arguments, discord_channel
+            started = time.perf_counter()
+            result, next_cursor = await context_tools.execute_tool(
+                function_name, channel_id, arguments, discord_channel, requester
+            )
+            has_more_pages = has_more_pages or next_cursor is not None
+            # Model-supplied names are untrusted, so keep label cardinality bounded
+            TOOL_EXECUTION_SECONDS.observe(
+                time.perf_counter() - started,
+                tool=(
+                    function_name
+                    if function_name in context_tools.tool_names
+                    else "unknown"
+                ),
             )
 
             tool_results.append(
@@ -262,7 +621,7 @@ async def process_tool_calls(
                     "tool_call_id": tool_call.get("id", f"call_{len(tool_results)}"),
                     "role": "tool",
                     "name": function_name,
-                    "content": result,
+                    "content": context_tools.budgeter.clip(result),
                 }
             )
 
@@ -276,4 +635,4 @@ async def process_tool_calls(
                 }
             )
 
-    return tool_results
+    return tool_results, has_more_pages
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from metrics import (
+    MISTRAL_ENDPOINT_EJECTED,
+    MISTRAL_ENDPOINT_EWMA_SECONDS,
+    MISTRAL_ENDPOINT_REQUESTS,
+)
+
+
+@dataclass
+class Endpoint:
+    url: str
+    api_key: str | None
+    name: str = ""
+    ewma_latency_s: float | None = None
+    ewma_error_rate: float = 0.0
+    in_flight: int = 0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+    probing: bool = False
+
+    def __post_init__(self):
+        if not self.name:
+            # Host only, so credentials embedded in URLs never reach metrics
+            self.name = urlsplit(self.url).netloc or self.url
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+
+class EndpointPool:
+    """Picks the fastest healthy endpoint using EWMA latency and error rates.
+
+    Endpoints that fail `eject_after` times in a row are ejected for a cooldown
+    that doubles on each repeat ejection. After the cooldown a single probe
+    request is allowed through; success readmits the endpoint, failure ejects
+    it again.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[Endpoint],
+        alpha: float = 0.3,
+        eject_after: int = 3,
+        eject_base_s: float = 15.0,
+        eject_max_s: float = 300.0,
+        explore_rate: float = 0.05,
+        prior_latency_s: float = 1.0,
+    ):
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.endpoints = endpoints
+        self.alpha = alpha
+        self.eject_after = eject_after
+        self.eject_base_s = eject_base_s
+        self.eject_max_s = eject_max_s
+        self.explore_rate = explore_rate
+        # Assumed latency before anything is measured; never zero, or the error
+        # rate would have nothing to scale
+        self.prior_latency_s = prior_latency_s
+        self._rng = random.Random()
+        for endpoint in endpoints:
+            MISTRAL_ENDPOINT_EJECTED.set(0, endpoint=endpoint.name)
+
+    def _score(self, endpoint: Endpoint, default_latency: float) -> float:
+        latency = endpoint.ewma_latency_s
+        if latency is None:
+            latency = default_latency
+            if endpoint.ewma_error_rate:
+                # Optimism about an untried endpoint ends with its first failure:
+                # it is assumed no faster than the best measured one
+                latency = max(2 * default_latency, self.prior_latency_s)
+        # Queue depth and recent errors both make an endpoint look slower
+        return (
+            latency
+            * (1 + endpoint.in_flight)
+            / max(0.05, 1.0 - endpoint.ewma_error_rate)
+        )
+
+    def choose(self) -> Endpoint:
+        if len(self.endpoints) == 1:
+            return self.endpoints[0]
+
+        now = time.monotonic()
+        healthy = [
+            endpoint
+            for endpoint in self.endpoints
+            if not endpoint.is_ejected(now) and not endpoint.probing
+        ]
+        if not healthy:
+            # Everything is ejected: try whichever comes back soonest
+            return min(self.endpoints, key=lambda endpoint: endpoint.ejected_until)
+
+        # Let one request through to an endpoint whose cooldown just ended
+        for endpoint in healthy:
+            if endpoint.ejections and endpoint.ejected_until:
+                endpoint.probing = True
+                endpoint.ejected_until = 0.0
+                MISTRAL_ENDPOINT_EJECTED.set(0, endpoint=endpoint.name)
+                return endpoint
+
+        # Occasionally refresh the estimate of endpoints that are not winning
+        if self._rng.random() < self.explore_rate:
+            return self._rng.choice(healthy)
+
+        # Unmeasured endpoints are tried first so every one gets an estimate
+        measured = [e.ewma_latency_s for e in healthy if e.ewma_latency_s is not None]
+        default_latency = min(measured) / 2 if measured else self.prior_latency_s
+        return min(healthy, key=lambda e: self._score(e, default_latency))
+
+    def acquire(self) -> Endpoint:
+        endpoint = self.choose()
+        endpoint.in_flight += 1
+        return endpoint
+
+    def release(self, endpoint: Endpoint, latency_s: float, ok: bool | None) -> None:
+        """Return an endpoint; `ok=None` means the request never completed."""
+        endpoint.in_flight = max(0, endpoint.in_flight - 1)
+        was_probe, endpoint.probing = endpoint.probing, False
+        if ok is None:
+            # Cancelled: no evidence either way, so the next request may probe
+            if was_probe:
+                endpoint.ejected_until = time.monotonic()
+            MISTRAL_ENDPOINT_REQUESTS.inc(endpoint=endpoint.name, outcome="abandoned")
+            return
+        alpha = self.alpha
+        if ok:
+            endpoint.ewma_latency_s = (
+                latency_s
+                if endpoint.ewma_latency_s is None
+                else alpha * latency_s + (1 - alpha) * endpoint.ewma_latency_s
+            )
+            endpoint.consecutive_failures = 0
+            endpoint.ejections = 0
+        else:
+            endpoint.consecutive_failures += 1
+        endpoint.ewma_error_rate = (
+            alpha * (0.0 if ok else 1.0) + (1 - alpha) * endpoint.ewma_error_rate
+        )
+
+        MISTRAL_ENDPOINT_REQUESTS.inc(
+            endpoint=endpoint.name, outcome="ok" if ok else "error"
+        )
+        if endpoint.ewma_latency_s is not None:
+            MISTRAL_ENDPOINT_EWMA_SECONDS.set(
+                endpoint.ewma_latency_s, endpoint=endpoint.name
+            )
+
+        if (
+            not ok
+            and len(self.endpoints) > 1
+            and (was_probe or endpoint.consecutive_failures >= self.eject_after)
+        ):
+            self._eject(endpoint)
+        MISTRAL_ENDPOINT_EJECTED.set(
+            1 if endpoint.is_ejected(time.monotonic()) else 0, endpoint=endpoint.name
+        )
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        cooldown = min(self.eject_max_s, self.eject_base_s * 2**endpoint.ejections)
+        endpoint.ejections += 1
+        endpoint.ejected_until = time.monotonic() + cooldown
+        endpoint.consecutive_failures = 0
+        print(
+            f"Ejected Mistral endpoint {endpoint.name} for {cooldown:.0f}s "
+            f"after repeated failures"
+        )
+
+    def snapshot(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "endpoint": endpoint.name,
+                "ewma_latency_s": endpoint.ewma_latency_s,
+                "error_rate": endpoint.ewma_error_rate,
+                "in_flight": endpoint.in_flight,
+                "ejected": endpoint.is_ejected(now),
+            }
+            for endpoint in self.endpoints
+        ]
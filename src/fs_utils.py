@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from pathlib import Path
+
+
+def atomic_write_bytes(path: Path, payload: bytes) -> None:
+    """Write via a temp file and rename so readers never see a partial file."""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def remove_stale_temp_files(directory: Path, min_age_s: float = 0.0) -> int:
+    # A minimum age spares writes in flight from other processes sharing the directory
+    removed = 0
+    cutoff = time.time() - min_age_s
+    for tmp in Path(directory).glob(".*.tmp"):
+        try:
+            if min_age_s and tmp.stat().st_mtime > cutoff:
+                continue
+            tmp.unlink()
+        except FileNotFoundError:
+            continue
+        removed += 1
+    return removed
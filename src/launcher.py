@@ -0,0 +1,160 @@
+"""
+Supervise several Okapi processes, each owning a contiguous range of shards
+
+Usage: python src/launcher.py --processes 4 [--shard-count 16]
+
+Each child runs src/bot.py with SHARD_COUNT and SHARD_IDS set. Children share
+the conversation store under CONTEXT_DATA_DIR (a guild, and so each channel, is
+served by one shard at a time), so shard and process counts may change freely.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+from pathlib import Path
+
+import aiohttp
+
+from config import DISCORD_TOKEN
+
+BOT_SCRIPT = Path(__file__).parent / "bot.py"
+
+# Discord allows one IDENTIFY per 5 seconds per concurrency bucket
+IDENTIFY_INTERVAL_S = 5.0
+MAX_RESTART_BACKOFF_S = 300.0
+
+
+async def fetch_recommended_shards(token: str) -> int:
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as s:
+        async with s.get(
+            "https://discord.com/api/v10/gateway/bot", headers=headers
+        ) as resp:
+            if resp.status >= 400:
+                raise RuntimeError(f"HTTP {resp.status}: {await resp.text()}")
+            data = await resp.json()
+            return int(data["shards"])
+
+
+def partition_shards(shard_count: int, processes: int) -> list[list[int]]:
+    processes = max(1, min(processes, shard_count))
+    base, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for i in range(processes):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+class ShardProcess:
+    def __init__(self, index: int, shard_ids: list[int], shard_count: int):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.process: asyncio.subprocess.Process | None = None
+        self.restarts = 0
+
+    @property
+    def label(self) -> str:
+        return f"shards {self.shard_ids[0]}-{self.shard_ids[-1]}"
+
+    async def start(self) -> None:
+        env = dict(os.environ)
+        env["SHARD_COUNT"] = str(self.shard_count)
+        env["SHARD_IDS"] = ",".join(str(i) for i in self.shard_ids)
+        if env.get("METRICS_PORT"):
+            # Each process serves its own metrics endpoint on consecutive ports
+            env["METRICS_PORT"] = str(int(env["METRICS_PORT"]) + self.index)
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, str(BOT_SCRIPT), env=env
+        )
+        print(f"Started {self.label} (pid {self.process.pid})")
+
+    async def supervise(self, stopping: asyncio.Event) -> None:
+        backoff = IDENTIFY_INTERVAL_S
+        while True:
+            await self.start()
+            exit_code = await self.process.wait()
+            if stopping.is_set():
+                return
+            if exit_code == 0:
+                print(f"{self.label} exited cleanly")
+                return
+
+            self.restarts += 1
+            print(
+                f"{self.label} exited with code {exit_code}; "
+                f"restarting in {backoff:.0f}s (restart #{self.restarts})"
+            )
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=backoff)
+                return
+            except asyncio.TimeoutError:
+                backoff = min(backoff * 2, MAX_RESTART_BACKOFF_S)
+
+    def terminate(self) -> None:
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+
+
+async def run(shard_count: int | None, processes: int) -> None:
+    if shard_count is None:
+        if not DISCORD_TOKEN:
+            raise RuntimeError("DISCORD_TOKEN is not set")
+        shard_count = await fetch_recommended_shards(DISCORD_TOKEN)
+        print(f"Using Discord's recommended shard count: {shard_count}")
+
+    children = [
+        ShardProcess(index, shard_ids, shard_count)
+        for index, shard_ids in enumerate(partition_shards(shard_count, processes))
+    ]
+
+    stopping = asyncio.Event()
+
+    def request_stop() -> None:
+        print("\nStopping shard processes")
+        stopping.set()
+        for child in children:
+            child.terminate()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, request_stop)
+
+    supervisors = []
+    for i, child in enumerate(children):
+        if i:
+            # Stagger start-up so shards don't fight over the identify rate limit
+            await asyncio.sleep(IDENTIFY_INTERVAL_S * len(children[i - 1].shard_ids))
+        if stopping.is_set():
+            break
+        supervisors.append(asyncio.create_task(child.supervise(stopping)))
+
+    await asyncio.gather(*supervisors)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Okapi as sharded processes")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of bot processes to run (default: CPU count)",
+    )
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=None,
+        help="Total shards across all processes (default: Discord's recommendation)",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.shard_count, args.processes))
+
+
+if __name__ == "__main__":
+    main()
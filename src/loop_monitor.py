@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+
+from config import LOOP_MONITOR_INTERVAL_MS, SLOW_CALLBACK_MS
+from metrics import METRICS
+
+
+EVENT_LOOP_DRIFT_SECONDS = METRICS.histogram(
+    "okapi_event_loop_drift_seconds",
+    "Scheduling drift of the event loop watchdog heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_STALLS = METRICS.counter(
+    "okapi_event_loop_stalls_total",
+    "Times a single loop step blocked longer than the slow-callback threshold",
+)
+
+
+@dataclass
+class LoopStall:
+    detected_at: float
+    blocked_s: float
+    coroutine: str
+    stack: str
+
+
+def _describe_coroutine(frame) -> str:
+    # The innermost coroutine frame is the code that is actually blocking
+    while frame is not None:
+        if frame.f_code.co_flags & inspect.CO_COROUTINE:
+            return f"{frame.f_code.co_qualname} ({frame.f_code.co_filename}:{frame.f_lineno})"
+        frame = frame.f_back
+    return "unknown (not inside a coroutine)"
+
+
+class LoopMonitor:
+    """Measures event loop drift and optionally reports steps that block too long.
+
+    A heartbeat task records how late each wakeup is. When a slow-callback
+    threshold is set, a watchdog thread notices a missing heartbeat while the loop
+    is still blocked and captures the loop thread's current stack.
+    """
+
+    def __init__(self, interval: float = 0.25, slow_callback_s: float = 0.0):
+        self.interval = interval
+        self.slow_callback_s = slow_callback_s
+        self.recent_stalls: deque[LoopStall] = deque(maxlen=50)
+        self.last_lag_s = 0.0
+        self._max_lag_s = 0.0
+        self._last_beat = time.monotonic()
+        self._beat_id = 0
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+
+        if self.slow_callback_s > 0:
+            self._watchdog = threading.Thread(
+                target=self._watch, name="okapi-loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+
+    def take_max_lag(self) -> float:
+        """Return the worst drift seen since the previous call and reset it."""
+        max_lag, self._max_lag_s = self._max_lag_s, 0.0
+        return max_lag
+
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._last_beat = time.monotonic()
+            self._beat_id += 1
+            self.last_lag_s = lag
+            self._max_lag_s = max(self._max_lag_s, lag)
+            EVENT_LOOP_DRIFT_SECONDS.observe(lag)
+
+    def _watch(self) -> None:
+        reported_beat = -1
+        poll = max(0.01, self.slow_callback_s / 4)
+        while not self._stopping.wait(poll):
+            blocked = time.monotonic() - self._last_beat - self.interval
+            beat_id = self._beat_id
+            if blocked < self.slow_callback_s or beat_id == reported_beat:
+                continue
+            # Report each stall once, while it is still in progress
+            reported_beat = beat_id
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stall = LoopStall(
+                detected_at=time.time(),
+                blocked_s=blocked,
+                coroutine=_describe_coroutine(frame),
+                stack="".join(traceback.format_stack(frame)),
+            )
+            self.recent_stalls.append(stall)
+            EVENT_LOOP_STALLS.inc()
+            print(
+                f"Event loop blocked for {blocked * 1000:.0f}ms+ in {stall.coroutine}\n"
+                f"{stall.stack}"
+            )
+
+
+loop_monitor = LoopMonitor(
+    interval=LOOP_MONITOR_INTERVAL_MS / 1000, slow_callback_s=SLOW_CALLBACK_MS / 1000
+)
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import bisect
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from aiohttp import web
+
+
+LATENCY_BUCKETS_S = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+SIZE_BUCKETS_BYTES = tuple(2**i for i in range(10, 27, 2))  # 1 KiB .. 64 MiB
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape_label(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    @abstractmethod
+    def render(self) -> list[str]: ...
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._function: Callable[[], float] | None = None
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        # For monotonic totals owned elsewhere (e.g. cache eviction counters)
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        if self._function is not None:
+            lines.append(f"{self.name} {_format_value(self._function())}")
+        for key, value in sorted(self._values.items()):
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        if self._function is not None and not labels:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        if self._function is not None:
+            lines.append(f"{self.name} {_format_value(self._function())}")
+        for key, value in sorted(self._values.items()):
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class _HistogramSeries:
+    __slots__ = ("bucket_counts", "count", "sum")
+
+    def __init__(self, bucket_count: int):
+        self.bucket_counts = [0] * bucket_count
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS_S,
+        window: int = 0,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: dict[tuple[str, ...], _HistogramSeries] = {}
+        # Optional ring of raw recent samples (all labels) for rolling quantiles
+        self._recent: deque[float] | None = deque(maxlen=window) if window else None
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.buckets))
+        series.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.count += 1
+        series.sum += value
+        if self._recent is not None:
+            self._recent.append(value)
+
+    def recent_quantiles(self, *quantiles: float) -> list[float | None]:
+        if not self._recent:
+            return [None for _ in quantiles]
+        ordered = sorted(self._recent)
+        last = len(ordered) - 1
+        return [ordered[min(last, int(q * len(ordered)))] for q in quantiles]
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.bucket_counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.label_names + ("le",), key + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labels: tuple[str, ...] = ()
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(
+        self, name: str, documentation: str, labels: tuple[str, ...] = ()
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS_S,
+        window: int = 0,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets, window))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+MISTRAL_REQUEST_SECONDS = METRICS.histogram(
+    "okapi_mistral_request_seconds",
+    "Latency of Mistral chat completion requests",
+    labels=("call",),
+    window=512,
+)
+MISTRAL_HTTP_RESPONSES = METRICS.counter(
+    "okapi_mistral_http_responses_total",
+    "Mistral API responses by HTTP status code",
+    labels=("status",),
+)
+MISTRAL_ROUTE_DECISIONS = METRICS.counter(
+    "okapi_mistral_route_decisions_total",
+    "Model routing decisions for /ask",
+    labels=("route", "reason"),
+)
+MISTRAL_ROUTE_SECONDS = METRICS.histogram(
+    "okapi_mistral_route_seconds",
+    "Latency of Mistral chat completion requests by model route",
+    labels=("route",),
+)
+MISTRAL_ROUTE_TOKENS = METRICS.counter(
+    "okapi_mistral_route_tokens_total",
+    "Tokens reported by Mistral usage blocks by model route",
+    labels=("route", "kind"),
+)
+MISTRAL_ENDPOINT_REQUESTS = METRICS.counter(
+    "okapi_mistral_endpoint_requests_total",
+    "Mistral requests by upstream endpoint and outcome",
+    labels=("endpoint", "outcome"),
+)
+MISTRAL_ENDPOINT_EWMA_SECONDS = METRICS.gauge(
+    "okapi_mistral_endpoint_ewma_seconds",
+    "Smoothed latency of successful requests per upstream endpoint",
+    labels=("endpoint",),
+)
+MISTRAL_ENDPOINT_EJECTED = METRICS.gauge(
+    "okapi_mistral_endpoint_ejected",
+    "Whether an upstream endpoint is currently ejected (1) or in rotation (0)",
+    labels=("endpoint",),
+)
+MISTRAL_CIRCUIT_STATE = METRICS.gauge(
+    "okapi_mistral_circuit_state",
+    "Mistral circuit breaker state (0 closed, 1 half-open, 2 open)",
+)
+MISTRAL_CIRCUIT_TRANSITIONS = METRICS.counter(
+    "okapi_mistral_circuit_transitions_total",
+    "Mistral circuit breaker state changes by new state",
+    labels=("state",),
+)
+MISTRAL_CIRCUIT_REJECTIONS = METRICS.counter(
+    "okapi_mistral_circuit_rejections_total",
+    "Mistral requests rejected without being sent because the circuit was open",
+)
+TOOL_EXECUTION_SECONDS = METRICS.histogram(
+    "okapi_tool_execution_seconds",
+    "Execution time of context tools",
+    labels=("tool",),
+)
+TOOL_OUTPUT_TOKENS = METRICS.counter(
+    "okapi_tool_output_tokens_total",
+    "Estimated tokens of tool results before (raw) and after (sent) compaction",
+    labels=("tool", "stage"),
+)
+GUILD_SEARCH_CHANNELS = METRICS.counter(
+    "okapi_guild_search_channels_total",
+    "Channels visited by guild-wide history searches by outcome",
+    labels=("outcome",),
+)
+CONTEXT_SAVE_SECONDS = METRICS.histogram(
+    "okapi_context_save_seconds", "Duration of context saves"
+)
+CONTEXT_SAVE_BYTES = METRICS.histogram(
+    "okapi_context_save_bytes",
+    "Size of saved context payloads",
+    buckets=SIZE_BUCKETS_BYTES,
+)
+CONTEXT_INGEST_BATCH_MESSAGES = METRICS.histogram(
+    "okapi_context_ingest_batch_messages",
+    "Passive channel messages applied per ingestion batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+CONTEXT_LOAD_SECONDS = METRICS.histogram(
+    "okapi_context_load_seconds", "Duration of context loads"
+)
+CONTEXT_LOAD_BYTES = METRICS.histogram(
+    "okapi_context_load_bytes",
+    "Size of loaded context payloads",
+    buckets=SIZE_BUCKETS_BYTES,
+)
+ACTIVE_CONTEXTS = METRICS.gauge(
+    "okapi_active_contexts", "Conversation contexts held in memory"
+)
+ACTIVE_CONTEXT_BYTES = METRICS.gauge(
+    "okapi_active_context_bytes", "Approximate bytes of in-memory contexts"
+)
+CONTEXT_CACHE_EVICTIONS = METRICS.counter(
+    "okapi_context_cache_evictions_total",
+    "Contexts evicted from memory to stay within the cache budget",
+)
+PROCESS_RSS_BYTES = METRICS.gauge(
+    "okapi_process_resident_memory_bytes", "Resident set size of the bot process"
+)
+PROCESS_CPU_PERCENT = METRICS.gauge(
+    "okapi_process_cpu_percent", "CPU usage of the bot process since last sample"
+)
+EVENT_LOOP_LAG_SECONDS = METRICS.gauge(
+    "okapi_event_loop_lag_seconds", "Most recent event loop scheduling delay"
+)
+CONTEXT_STORE_BYTES = METRICS.gauge(
+    "okapi_context_store_bytes", "On-disk size of the context store"
+)
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        text=METRICS.render(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def _handle_trace(request: web.Request) -> web.Response:
+    from tracing import tracer  # tracing registers its metrics here, import lazily
+
+    return web.json_response(
+        {"traceEvents": tracer.chrome_trace_events(), "displayTimeUnit": "ms"}
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    app.router.add_get("/trace", _handle_trace)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    print(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return runner
@@ -1,14 +1,40 @@
 from __future__ import annotations
 
+import asyncio
+import time
+
 import aiohttp
 from typing import Any
 
+from circuit_breaker import CircuitBreaker
 from config import (
+    FAST_MODEL_DISPLAY_NAME,
     MISTRAL_API_KEY,
     MISTRAL_API_URL,
+    MISTRAL_BREAKER_FAILURES,
+    MISTRAL_BREAKER_OPEN_S,
+    MISTRAL_BREAKER_WINDOW_S,
+    MISTRAL_ENDPOINTS,
+    MISTRAL_FAST_MODEL_ID,
     MISTRAL_MODEL_ID,
+    MODEL_DISPLAY_NAME,
+    MODEL_ROUTER_FAST_MAX_CHARS,
     MODEL_TEMPERATURE,
 )
+from metrics import (
+    MISTRAL_HTTP_RESPONSES,
+    MISTRAL_REQUEST_SECONDS,
+    MISTRAL_ROUTE_DECISIONS,
+    MISTRAL_ROUTE_SECONDS,
+    MISTRAL_ROUTE_TOKENS,
+)
+from endpoint_pool import Endpoint, EndpointPool
+from model_router import ModelRouter, RouteDecision
+from prompts import (
+    CONTEXT_AWARE_SYSTEM_MESSAGE,
+    DEFAULT_SYSTEM_MESSAGE,
+    encode_chat_payload,
+)
 
 
 class MistralClient:
@@ -21,69 +47,117 @@ class MistralClient:
         self.api_key = api_key or MISTRAL_API_KEY
         self.api_url = api_url or MISTRAL_API_URL
         self.model_id = model_id or MISTRAL_MODEL_ID
+        if api_url is None and MISTRAL_ENDPOINTS:
+            endpoints = [
+                Endpoint(url, key or self.api_key) for url, key in MISTRAL_ENDPOINTS
+            ]
+        else:
+            endpoints = [Endpoint(self.api_url, self.api_key)]
+        self.pool = EndpointPool(endpoints)
+        self.breaker = CircuitBreaker(
+            "Mistral",
+            failure_threshold=MISTRAL_BREAKER_FAILURES,
+            window_s=MISTRAL_BREAKER_WINDOW_S,
+            open_s=MISTRAL_BREAKER_OPEN_S,
+        )
+        self.router = ModelRouter(
+            self.model_id,
+            MODEL_DISPLAY_NAME,
+            MISTRAL_FAST_MODEL_ID,
+            FAST_MODEL_DISPLAY_NAME,
+            MODEL_ROUTER_FAST_MAX_CHARS,
+        )
+
+    def route(self, query: str) -> RouteDecision:
+        decision = self.router.classify(query)
+        MISTRAL_ROUTE_DECISIONS.inc(route=decision.route, reason=decision.reason)
+        return decision
 
     async def create_chat_completion(
         self,
         messages: list[dict[str, str]] = None,
         user_message: str = None,
-        system_prompt: str = "You're a helpful assistant named Okapi. Use tools to access conversation history only when needed for context.",
+        system_message: dict[str, str] = DEFAULT_SYSTEM_MESSAGE,
         tools: list[dict[str, Any]] = None,
         tool_choice: str = "auto",
+        call_name: str = "chat",
+        route: RouteDecision | None = None,
     ) -> dict[str, Any]:
-        if not self.api_key:
+        if not all(endpoint.api_key for endpoint in self.pool.endpoints):
             raise RuntimeError("MISTRAL_API_KEY is not set")
 
         if messages is None:
             if user_message is None:
                 raise ValueError("Either messages or user_message must be provided")
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ]
-        else:
-            has_system = any(msg.get("role") == "system" for msg in messages)
-            if not has_system:
-                messages = [{"role": "system", "content": system_prompt}] + messages
+            messages = [system_message, {"role": "user", "content": user_message}]
+        elif not messages or messages[0].get("role") != "system":
+            # System prompts always lead, so checking the first message is enough
+            messages = [system_message] + messages
 
         timeout = aiohttp.ClientTimeout(total=60)
+
+        model_id = route.model_id if route else self.model_id
+        route_name = route.route if route else "full"
+        body = encode_chat_payload(
+            model_id, messages, MODEL_TEMPERATURE, tools, tool_choice
+        )
+
+        probe = self.breaker.before_call()
+        endpoint = self.pool.acquire()
+        # None until the request completes; cancellation leaves it unknown
+        endpoint_ok: bool | None = None
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
+            "Authorization": f"Bearer {endpoint.api_key}",
             "Content-Type": "application/json",
         }
-
-        payload: dict[str, Any] = {
-            "model": self.model_id,
-            "messages": messages,
-            "temperature": MODEL_TEMPERATURE,
-        }
-
-        if tools:
-            payload["tools"] = tools
-            payload["tool_choice"] = tool_choice
-
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(
-                self.api_url, headers=headers, json=payload
-            ) as resp:
-                text = await resp.text()
-                if resp.status >= 400:
-                    raise RuntimeError(f"HTTP {resp.status}: {text}")
-                return await resp.json()
+        started = time.perf_counter()
+        try:
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.post(
+                    endpoint.url, headers=headers, data=body
+                ) as resp:
+                    MISTRAL_HTTP_RESPONSES.inc(status=str(resp.status))
+                    text = await resp.text()
+                    if resp.status >= 400:
+                        # Other 4xx responses are problems with the request itself
+                        endpoint_ok = resp.status < 500 and resp.status != 429
+                        raise RuntimeError(f"HTTP {resp.status}: {text}")
+                    data = await resp.json()
+                    endpoint_ok = True
+                    usage = data.get("usage") or {}
+                    for kind in ("prompt_tokens", "completion_tokens"):
+                        if usage.get(kind):
+                            MISTRAL_ROUTE_TOKENS.inc(
+                                usage[kind], route=route_name, kind=kind
+                            )
+                    return data
+        except asyncio.TimeoutError:
+            endpoint_ok = False
+            MISTRAL_HTTP_RESPONSES.inc(status="timeout")
+            raise
+        except aiohttp.ClientError:
+            endpoint_ok = False
+            MISTRAL_HTTP_RESPONSES.inc(status="connection_error")
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.pool.release(endpoint, elapsed, endpoint_ok)
+            self.breaker.record(endpoint_ok, probe)
+            MISTRAL_REQUEST_SECONDS.observe(elapsed, call=call_name)
+            MISTRAL_ROUTE_SECONDS.observe(elapsed, route=route_name)
 
     async def create_context_aware_completion(
         self,
         conversation_messages: list[dict[str, str]],
         tools: list[dict[str, Any]] = None,
+        call_name: str = "first",
+        route: RouteDecision | None = None,
     ) -> dict[str, Any]:
-        system_prompt = (
-            "You're a helpful, clever, and funny assistant named Okapi. "
-            "You can access conversation history using tools when needed for follow-up questions or references to past discussions. "
-            "Be very concise in most responses. For standalone questions, answer directly without fetching context."
-        )
-
         return await self.create_chat_completion(
             messages=conversation_messages,
-            system_prompt=system_prompt,
+            system_message=CONTEXT_AWARE_SYSTEM_MESSAGE,
             tools=tools,
             tool_choice="auto",
+            call_name=call_name,
+            route=route,
         )
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+# Phrases that usually mean the answer depends on earlier conversation, so the
+# model is likely to call the history tools and benefit from the full model
+_FOLLOW_UP_CUES = re.compile(
+    r"\b(earlier|before|previous(ly)?|last time|you said|we (talked|discussed|said)|"
+    r"remember|again|above|that one|as i said|continue|summar(y|ize|ise)|"
+    r"what did)\b",
+    re.IGNORECASE,
+)
+_REASONING_CUES = re.compile(
+    r"\b(why|explain|prove|derive|step[- ]by[- ]step|compare|analy[sz]e|calculate|"
+    r"solve|debug|implement|refactor|optimi[sz]e|plan)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    route: str
+    model_id: str
+    display_name: str
+    reason: str
+
+
+class ModelRouter:
+    """Sends short standalone questions to a fast model and the rest to the full one."""
+
+    def __init__(
+        self,
+        full_model: str,
+        full_display_name: str,
+        fast_model: str | None = None,
+        fast_display_name: str | None = None,
+        fast_max_chars: int = 160,
+    ):
+        self.full = RouteDecision("full", full_model, full_display_name, "default")
+        self.fast_model = fast_model
+        self.fast_display_name = fast_display_name or fast_model
+        self.fast_max_chars = fast_max_chars
+
+    def _full(self, reason: str) -> RouteDecision:
+        return RouteDecision("full", self.full.model_id, self.full.display_name, reason)
+
+    def classify(self, query: str) -> RouteDecision:
+        if not self.fast_model:
+            return self._full("no_fast_model")
+        if len(query) > self.fast_max_chars:
+            return self._full("long")
+        if "```" in query or "\n" in query:
+            return self._full("multiline")
+        if _FOLLOW_UP_CUES.search(query):
+            return self._full("follow_up")
+        if _REASONING_CUES.search(query):
+            return self._full("reasoning")
+        return RouteDecision(
+            "fast", self.fast_model, self.fast_display_name, "short_standalone"
+        )
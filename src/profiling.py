@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
+from config import CONTEXT_DATA_DIR
+from tracing import write_chrome_trace
+
+
+def _timestamp() -> str:
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def _stack_of(frame) -> list[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _samples_to_trace_events(
+    samples: list[tuple[float, list[str]]], interval_s: float
+) -> list[dict]:
+    # Merge consecutive samples sharing a stack prefix into complete ("X") events
+    if not samples:
+        return []
+    events, open_frames = [], []
+    start = samples[0][0]
+    end = samples[-1][0] + interval_s
+    for ts, stack in samples + [(end, [])]:
+        depth = 0
+        while (
+            depth < len(open_frames)
+            and depth < len(stack)
+            and open_frames[depth][0] == stack[depth]
+        ):
+            depth += 1
+        for name, began in reversed(open_frames[depth:]):
+            events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (began - start) * 1e6,
+                    "dur": (ts - began) * 1e6,
+                    "pid": 1,
+                    "tid": 1,
+                }
+            )
+        open_frames = open_frames[:depth] + [(name, ts) for name in stack[depth:]]
+    return events
+
+
+class Profiler:
+    """Opt-in, on-demand profiling of a live bot process."""
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = Path(output_dir)
+        self._ask_remaining = 0
+        self._ask_active = 0
+        self._ask_profile: cProfile.Profile | None = None
+        self._ask_captured = 0
+        self._last_snapshot: tracemalloc.Snapshot | None = None
+        self._loop_thread_id: int | None = None
+
+    # cProfile around the next N /ask executions
+
+    def arm_ask_profile(self, count: int) -> None:
+        self._ask_remaining = count
+        self._ask_captured = 0
+
+    @property
+    def ask_profile_pending(self) -> int:
+        return self._ask_remaining
+
+    @asynccontextmanager
+    async def profile_ask(self) -> AsyncIterator[None]:
+        if self._ask_remaining <= 0:
+            yield
+            return
+
+        self._ask_remaining -= 1
+        # Only one profiler can be active per thread, so overlapping /ask runs share
+        # one; it also sees other tasks that interleave while it is enabled
+        if self._ask_profile is None:
+            self._ask_profile = cProfile.Profile()
+        if self._ask_active == 0:
+            self._ask_profile.enable()
+        self._ask_active += 1
+        try:
+            yield
+        finally:
+            self._ask_active -= 1
+            self._ask_captured += 1
+            if self._ask_active == 0:
+                self._ask_profile.disable()
+                if self._ask_remaining <= 0:
+                    self._dump_ask_profile()
+
+    def _dump_ask_profile(self) -> None:
+        profile, self._ask_profile = self._ask_profile, None
+        if profile is None:
+            return
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"ask-{_timestamp()}-{self._ask_captured}runs.pstats"
+        pstats.Stats(profile).dump_stats(path)
+        print(f"Wrote /ask profile of {self._ask_captured} run(s) to {path}")
+
+    # tracemalloc snapshot diffs
+
+    async def memory_snapshot(self, active_contexts_bytes: int) -> Path | None:
+        """Start tracing on first use; afterwards diff against the previous call."""
+        # Snapshots and diffs of a large heap take seconds; keep them off the loop
+        return await asyncio.to_thread(self._memory_snapshot, active_contexts_bytes)
+
+    def _memory_snapshot(self, active_contexts_bytes: int) -> Path | None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._last_snapshot = tracemalloc.take_snapshot()
+            return None
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        stamp = _timestamp()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        snapshot.dump(str(self.output_dir / f"memory-{stamp}.tracemalloc"))
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"traced: {current} bytes (peak {peak})",
+            f"active_contexts (approx): {active_contexts_bytes} bytes",
+            "",
+            "Top allocation growth since previous snapshot:",
+        ]
+        if self._last_snapshot is not None:
+            for stat in snapshot.compare_to(self._last_snapshot, "traceback")[:25]:
+                lines.append(
+                    f"{stat.size_diff:+d} B ({stat.count_diff:+d} blocks), "
+                    f"now {stat.size} B"
+                )
+                lines.extend(f"    {line}" for line in stat.traceback.format()[-6:])
+        self._last_snapshot = snapshot
+
+        path = self.output_dir / f"memory-{stamp}.txt"
+        path.write_text("\n".join(lines) + "\n")
+        return path
+
+    def stop_memory_tracing(self) -> None:
+        self._last_snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # Sampling stack dump of the event loop thread
+
+    def bind_loop_thread(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+
+    def _sample_stacks(
+        self, duration_s: float, interval_s: float
+    ) -> list[tuple[float, list[str]]]:
+        samples = []
+        deadline = time.perf_counter() + duration_s
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                samples.append((time.perf_counter(), _stack_of(frame)))
+            time.sleep(interval_s)
+        return samples
+
+    async def sample_stacks(
+        self, duration_s: float, interval_s: float = 0.005
+    ) -> tuple[Path, Path]:
+        if self._loop_thread_id is None:
+            self.bind_loop_thread()
+        samples = await asyncio.to_thread(self._sample_stacks, duration_s, interval_s)
+
+        events = _samples_to_trace_events(samples, interval_s)
+
+        folded: dict[str, int] = {}
+        for _, stack in samples:
+            key = ";".join(stack)
+            folded[key] = folded.get(key, 0) + 1
+
+        stamp = _timestamp()
+        trace_path = self.output_dir / f"stacks-{stamp}.trace.json"
+        write_chrome_trace(
+            trace_path,
+            events,
+            {"samples": len(samples), "interval_ms": interval_s * 1000},
+        )
+        folded_path = self.output_dir / f"stacks-{stamp}.folded"
+        folded_path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in folded.items())
+        )
+        return trace_path, folded_path
+
+
+profiler = Profiler(Path(CONTEXT_DATA_DIR).parent / "profiles")
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+# Static prompt segments are encoded once. Their JSON fragments are keyed by the
+# object's id(), so callers must pass these exact objects and never mutate them.
+_FRAGMENTS: dict[int, str] = {}
+_STATIC_OBJECTS: list[Any] = []
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_dumps = _ENCODER.encode
+
+
+def register_static(value: Any) -> Any:
+    """Pre-encode an immutable prompt segment and return it unchanged."""
+    if id(value) not in _FRAGMENTS:
+        _FRAGMENTS[id(value)] = _dumps(value)
+        # Hold a reference so the id can never be reused by another object
+        _STATIC_OBJECTS.append(value)
+    return value
+
+
+def encode_json(value: Any) -> str:
+    fragment = _FRAGMENTS.get(id(value))
+    return fragment if fragment is not None else _dumps(value)
+
+
+def encode_messages(messages: list[dict[str, Any]]) -> str:
+    return "[" + ",".join(encode_json(message) for message in messages) + "]"
+
+
+def encode_chat_payload(
+    model: str,
+    messages: list[dict[str, Any]],
+    temperature: float,
+    tools: list[dict[str, Any]] | None = None,
+    tool_choice: str = "auto",
+) -> bytes:
+    # Spliced by hand so static messages and the tool schema are never re-encoded
+    parts = [
+        '{"model":',
+        _dumps(model),
+        ',"temperature":',
+        _dumps(temperature),
+        ',"messages":',
+        encode_messages(messages),
+    ]
+    if tools:
+        parts += [
+            ',"tools":',
+            encode_json(tools),
+            ',"tool_choice":',
+            _dumps(tool_choice),
+        ]
+    parts.append("}")
+    return "".join(parts).encode("utf-8")
+
+
+DEFAULT_SYSTEM_MESSAGE = register_static(
+    {
+        "role": "system",
+        "content": "You're a helpful assistant named Okapi. Use tools to access conversation history only when needed for context.",
+    }
+)
+
+CONTEXT_AWARE_SYSTEM_MESSAGE = register_static(
+    {
+        "role": "system",
+        "content": (
+            "You're a helpful, clever, and funny assistant named Okapi. "
+            "You can access conversation history using tools when needed for follow-up questions or references to past discussions. "
+            "Be very concise in most responses. For standalone questions, answer directly without fetching context."
+        ),
+    }
+)
+
+TOOL_USAGE_MESSAGE = register_static(
+    {
+        "role": "system",
+        "content": (
+            "You have access to conversation history tools. You should use them for virtually all messages to maintain conversational continuity:\n"
+            "- Use 'fetch_recent_messages' by default to understand the conversation flow and provide contextually relevant responses.\n"
+            "- Use 'search_conversation_history' when the user asks about specific past topics or when recent messages aren't sufficient. Set scope to 'guild' only when they ask about other channels in the server.\n"
+            "- Use 'fetch_messages_in_range' when the user refers to a specific time (e.g. 'yesterday afternoon', 'this morning').\n"
+            "- ONLY skip context tools if the user is asking a completely standalone question that has no possible relation to previous conversation (e.g., 'what is 2+2?', 'define photosynthesis').\n"
+            "When in doubt, fetch context. Better to have context and not need it than to miss important conversational cues."
+        ),
+    }
+)
+
+TONE_MESSAGE = register_static(
+    {
+        "role": "system",
+        "content": (
+            "Tone and formality guidelines:\n"
+            "1. SENSITIVE TOPICS (terrorism, violence, death, tragedy, war crimes, genocide, serious historical atrocities):\n"
+            "   - ALWAYS use formal, respectful tone regardless of user's style\n"
+            "   - NEVER use emojis, casual phrases, or exclamation marks\n"
+            "   - Be factual, clear, and appropriately serious\n"
+            "2. CASUAL TOPICS (general chat, lighthearted questions, everyday topics):\n"
+            "   - Match the user's tone and energy\n"
+            "   - If they write in lowercase, you can too\n"
+            "   - Be playful with playful messages\n"
+            "\n"
+            "3. TECHNICAL/EDUCATIONAL TOPICS:\n"
+            "   - Use clear, professional language\n"
+            "   - Be concise and informative\n"
+            "\n"
+            "Read the context and adapt appropriately. When in doubt about sensitivity, err on the side of formality."
+        ),
+    }
+)
+
+
+_datetime_minute = -1
+_datetime_message: dict[str, str] = {}
+
+
+def current_datetime_message() -> dict[str, str]:
+    # The prompt only has minute resolution, so one message per minute is reused
+    global _datetime_minute, _datetime_message
+    minute = int(time.time() // 60)
+    if minute != _datetime_minute:
+        current_datetime = datetime.now(timezone.utc).strftime(
+            "%A, %B %d, %Y at %I:%M %p UTC"
+        )
+        _datetime_message = {
+            "role": "system",
+            "content": f"The current date and time is {current_datetime}.",
+        }
+        _datetime_minute = minute
+    return _datetime_message
+
+
+def build_ask_messages(user_preferred_name: str, query: str) -> list[dict[str, Any]]:
+    return [
+        current_datetime_message(),
+        {
+            "role": "system",
+            "content": (
+                f"The current user's preferred name is '{user_preferred_name}'. "
+                "Address them by name only during greeting and do not invent personal details."
+            ),
+        },
+        TOOL_USAGE_MESSAGE,
+        TONE_MESSAGE,
+        {"role": "user", "content": query},
+    ]
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import psutil
+
+from loop_monitor import loop_monitor
+from metrics import (
+    CONTEXT_STORE_BYTES,
+    EVENT_LOOP_LAG_SECONDS,
+    MISTRAL_REQUEST_SECONDS,
+    PROCESS_CPU_PERCENT,
+    PROCESS_RSS_BYTES,
+)
+
+if TYPE_CHECKING:
+    from context_manager import ContextManager
+
+
+@dataclass
+class RuntimeSnapshot:
+    sampled_at: float = 0.0
+    rss_bytes: int = 0
+    cpu_percent: float = 0.0
+    loop_lag_s: float = 0.0
+    active_contexts: int = 0
+    active_tokens: int = 0
+    mistral_p50_s: float | None = None
+    mistral_p95_s: float | None = None
+    store_bytes: int = 0
+
+
+def _directory_size(path: Path) -> int:
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+                elif entry.is_dir(follow_symlinks=False):
+                    total += _directory_size(Path(entry.path))
+    except FileNotFoundError:
+        pass
+    return total
+
+
+class RuntimeStatsCollector:
+    """Samples process and bot statistics in the background for /ping verbose."""
+
+    def __init__(self, interval: float = 15.0):
+        self.interval = interval
+        self.snapshot = RuntimeSnapshot()
+        self._process = psutil.Process()
+        self._context_manager: ContextManager | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self, context_manager: ContextManager) -> None:
+        self._context_manager = context_manager
+        if self._task is None or self._task.done():
+            # Prime cpu_percent so the first real sample covers a full interval
+            self._process.cpu_percent(interval=None)
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._sample(loop_monitor.take_max_lag())
+            except Exception as e:
+                print(f"Error sampling runtime stats: {e}")
+
+    async def _sample(self, loop_lag_s: float) -> None:
+        active_contexts = 0
+        active_tokens = 0
+        store_bytes = self.snapshot.store_bytes
+        if self._context_manager is not None:
+            contexts = list(self._context_manager.active_contexts.values())
+            active_contexts = len(contexts)
+            active_tokens = sum(context.total_tokens for context in contexts)
+            store_bytes = await asyncio.to_thread(
+                _directory_size, self._context_manager.data_dir
+            )
+
+        p50, p95 = MISTRAL_REQUEST_SECONDS.recent_quantiles(0.5, 0.95)
+        snapshot = RuntimeSnapshot(
+            sampled_at=time.time(),
+            rss_bytes=self._process.memory_info().rss,
+            cpu_percent=self._process.cpu_percent(interval=None),
+            loop_lag_s=loop_lag_s,
+            active_contexts=active_contexts,
+            active_tokens=active_tokens,
+            mistral_p50_s=p50,
+            mistral_p95_s=p95,
+            store_bytes=store_bytes,
+        )
+        self.snapshot = snapshot
+
+        PROCESS_RSS_BYTES.set(snapshot.rss_bytes)
+        PROCESS_CPU_PERCENT.set(snapshot.cpu_percent)
+        EVENT_LOOP_LAG_SECONDS.set(snapshot.loop_lag_s)
+        CONTEXT_STORE_BYTES.set(snapshot.store_bytes)
+
+
+runtime_stats = RuntimeStatsCollector()
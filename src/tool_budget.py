@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from context_manager import ConversationMessage
+from metrics import TOOL_OUTPUT_TOKENS
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_ELLIPSIS = "…"
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _dedupe_key(content: str) -> str:
+    # Case, punctuation and spacing differences do not make a message new
+    return " ".join(_NON_WORD.sub("", content.lower()).split())
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[: max_chars - 1]
+    space = cut.rfind(" ")
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip() + _ELLIPSIS
+
+
+def _format_line(msg: ConversationMessage, content: str, timestamp_format: str) -> str:
+    timestamp = datetime.fromtimestamp(msg.timestamp, tz=timezone.utc)
+    return f"[{timestamp.strftime(timestamp_format)}] {msg.author_name}: {content}"
+
+
+@dataclass
+class _Entry:
+    message: ConversationMessage
+    content: str
+    repeats: int = 1
+
+
+class ToolOutputBudgeter:
+    """Compacts message dumps returned by tools before they go back to the model.
+
+    Messages are flattened to one line, long ones are cut with an ellipsis,
+    repeats of the same text are dropped (the kept copy notes how many), and
+    consecutive messages by one author share a single "[time] author:" prefix.
+    Whatever still does not fit `token_budget` is dropped from the low-priority
+    end: the oldest messages, or the lowest ranked search results.
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        max_message_chars: int,
+        estimate_tokens: Callable[[str], int] = _estimate_tokens,
+    ):
+        self.token_budget = token_budget
+        self.max_message_chars = max_message_chars
+        self.estimate_tokens = estimate_tokens
+
+    def render_messages(
+        self,
+        tool: str,
+        header: str,
+        messages: list[ConversationMessage],
+        timestamp_format: str,
+        keep_newest: bool = True,
+    ) -> str:
+        """Format `messages` (in display order) under `header` within the budget.
+
+        With `keep_newest` the end of the list is kept when trimming, otherwise
+        the start is.
+        """
+        entries = self._dedupe(messages, keep_newest)
+        count = self._longest_fitting(
+            lambda count: self._render(
+                header, entries, count, timestamp_format, keep_newest
+            ),
+            len(entries),
+        )
+        text = self.clip(
+            self._render(header, entries, count, timestamp_format, keep_newest)
+        )
+        self._observe(tool, header, messages, timestamp_format, text)
+        return text
+
+    def render_page(
+        self,
+        tool: str,
+        header: str,
+        messages: list[ConversationMessage],
+        timestamp_format: str,
+        footer: Callable[[int], str],
+    ) -> tuple[str, int]:
+        """Format the longest prefix of `messages` that fits the budget.
+
+        Returns the text and how many messages it covers, so callers can hand
+        out a cursor for the rest. `footer(count)` is appended to the page.
+        """
+
+        def render(count: int) -> str:
+            entries = self._dedupe(messages[:count], keep_newest=False)
+            return self._render(header, entries, len(entries), timestamp_format, False)
+
+        count = self._longest_fitting(
+            lambda count: render(count) + footer(count), len(messages)
+        )
+        # The footer carries the cursor, so only the body may be clipped
+        tail = footer(count)
+        text = (
+            self.clip(render(count), self.token_budget - self.estimate_tokens(tail))
+            + tail
+        )
+        self._observe(tool, header, messages, timestamp_format, text)
+        return text, count
+
+    def clip(self, text: str, token_budget: int | None = None) -> str:
+        """Hard cap for any tool result, in case structured compaction was not enough."""
+        if token_budget is None:
+            token_budget = self.token_budget
+        tokens = self.estimate_tokens(text)
+        if tokens <= token_budget:
+            return text
+        # Cut in proportion, then tighten until the estimator agrees
+        max_chars = max(16, len(text) * token_budget // tokens)
+        clipped = _shorten(text, max_chars)
+        while max_chars > 16 and self.estimate_tokens(clipped) > token_budget:
+            max_chars = max(16, max_chars * 9 // 10)
+            clipped = _shorten(text, max_chars)
+        return clipped
+
+    def _longest_fitting(self, render: Callable[[int], str], total: int) -> int:
+        # Output only grows with the count, so binary search the largest that fits
+        low, high = min(1, total), total
+        while low < high:
+            count = (low + high + 1) // 2
+            if self.estimate_tokens(render(count)) <= self.token_budget:
+                low = count
+            else:
+                high = count - 1
+        return low
+
+    def _observe(
+        self,
+        tool: str,
+        header: str,
+        messages: list[ConversationMessage],
+        timestamp_format: str,
+        text: str,
+    ) -> None:
+        # "raw" is what the tool used to return: every message, unabridged
+        raw_tokens = self.estimate_tokens(
+            header
+            + "\n".join(
+                _format_line(msg, msg.content, timestamp_format) for msg in messages
+            )
+        )
+        TOOL_OUTPUT_TOKENS.inc(raw_tokens, tool=tool, stage="raw")
+        TOOL_OUTPUT_TOKENS.inc(self.estimate_tokens(text), tool=tool, stage="sent")
+
+    def _dedupe(
+        self, messages: list[ConversationMessage], keep_newest: bool
+    ) -> list[_Entry]:
+        # Walk in priority order so the copy that survives is the one we'd keep
+        ordered = reversed(messages) if keep_newest else messages
+        entries: list[_Entry] = []
+        seen: dict[str, _Entry] = {}
+        for msg in ordered:
+            content = " ".join(msg.content.split())
+            key = _dedupe_key(content)
+            if key and key in seen:
+                seen[key].repeats += 1
+                continue
+            entry = _Entry(msg, _shorten(content, self.max_message_chars))
+            entries.append(entry)
+            if key:
+                seen[key] = entry
+        if keep_newest:
+            entries.reverse()
+        return entries
+
+    def _render(
+        self,
+        header: str,
+        entries: list[_Entry],
+        count: int,
+        timestamp_format: str,
+        keep_newest: bool,
+    ) -> str:
+        kept = entries[len(entries) - count :] if keep_newest else entries[:count]
+        lines: list[str] = []
+        previous_author: tuple[str, str] | None = None
+        for entry in kept:
+            content = entry.content
+            if entry.repeats > 1:
+                content = f"{content} (x{entry.repeats})"
+            # The name is part of the key because it may carry a channel label
+            author = (entry.message.author_id, entry.message.author_name)
+            if author == previous_author:
+                lines[-1] += f" / {content}"
+                continue
+            lines.append(_format_line(entry.message, content, timestamp_format))
+            previous_author = author
+
+        omitted = len(entries) - count
+        if omitted:
+            note = (
+                f"({omitted} older messages omitted to fit the output budget)"
+                if keep_newest
+                else f"({omitted} lower-ranked matches omitted to fit the output budget)"
+            )
+            if keep_newest:
+                lines.insert(0, note)
+            else:
+                lines.append(note)
+        return header + "\n".join(lines)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+from metrics import METRICS
+
+
+ASK_STAGE_SECONDS = METRICS.histogram(
+    "okapi_ask_stage_seconds", "Duration of each /ask pipeline stage", labels=("stage",)
+)
+
+
+@dataclass
+class Span:
+    name: str
+    start_ns: int
+    end_ns: int = 0
+
+
+@dataclass
+class RequestTrace:
+    request_id: str
+    name: str
+    started_at: float
+    start_ns: int
+    end_ns: int = 0
+    spans: list[Span] = field(default_factory=list)
+    error: str | None = None
+
+
+_current_trace: ContextVar[RequestTrace | None] = ContextVar(
+    "okapi_current_trace", default=None
+)
+
+
+def write_chrome_trace(path: Path, events: list[dict], metadata: dict = None) -> None:
+    # Chrome trace event format, loadable in chrome://tracing and Perfetto
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"traceEvents": events, "displayTimeUnit": "ms"}
+    if metadata:
+        payload["metadata"] = metadata
+    path.write_text(json.dumps(payload, separators=(",", ":")))
+
+
+class Tracer:
+    """Per-request stage spans kept in a ring buffer of recent requests."""
+
+    def __init__(self, capacity: int = 256):
+        self.recent: deque[RequestTrace] = deque(maxlen=capacity)
+
+    @contextmanager
+    def request(self, name: str, request_id: str) -> Iterator[RequestTrace]:
+        trace = RequestTrace(
+            request_id=str(request_id),
+            name=name,
+            started_at=time.time(),
+            start_ns=time.perf_counter_ns(),
+        )
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = type(e).__name__
+            raise
+        finally:
+            trace.end_ns = time.perf_counter_ns()
+            _current_trace.reset(token)
+            self.recent.append(trace)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        trace = _current_trace.get()
+        if trace is None:
+            yield
+            return
+        span = Span(name=name, start_ns=time.perf_counter_ns())
+        try:
+            yield
+        finally:
+            span.end_ns = time.perf_counter_ns()
+            trace.spans.append(span)
+            ASK_STAGE_SECONDS.observe((span.end_ns - span.start_ns) / 1e9, stage=name)
+
+    def chrome_trace_events(self) -> list[dict]:
+        traces = list(self.recent)
+        if not traces:
+            return []
+        origin = min(trace.start_ns for trace in traces)
+        events = []
+        # One row per request so concurrent requests don't overlap visually
+        for row, trace in enumerate(traces, start=1):
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": row,
+                    "args": {"name": f"{trace.name} {trace.request_id}"},
+                }
+            )
+            events.append(
+                {
+                    "name": trace.name,
+                    "cat": "request",
+                    "ph": "X",
+                    "ts": (trace.start_ns - origin) / 1000,
+                    "dur": (trace.end_ns - trace.start_ns) / 1000,
+                    "pid": 1,
+                    "tid": row,
+                    "args": {
+                        "request_id": trace.request_id,
+                        "started_at": trace.started_at,
+                        "error": trace.error,
+                    },
+                }
+            )
+            for span in trace.spans:
+                events.append(
+                    {
+                        "name": span.name,
+                        "cat": "stage",
+                        "ph": "X",
+                        "ts": (span.start_ns - origin) / 1000,
+                        "dur": (span.end_ns - span.start_ns) / 1000,
+                        "pid": 1,
+                        "tid": row,
+                        "args": {"request_id": trace.request_id},
+                    }
+                )
+        return events
+
+    def export_chrome_trace(self, path: Path) -> Path:
+        write_chrome_trace(
+            path, self.chrome_trace_events(), {"requests": len(self.recent)}
+        )
+        return path
+
+
+tracer = Tracer()
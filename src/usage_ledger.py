@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import base64
+import calendar
+import json
+import time
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Any
+
+from crypto_utils import encrypt_json_bytes, decrypt_json_bytes
+
+_HOUR_S = 3600
+_DAY_S = 24 * _HOUR_S
+
+
+@dataclass
+class UsageBucket:
+    hour: int
+    channel_id: str
+    user_id: str
+    model: str
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tool_calls: int = 0
+    latency_s_sum: float = 0.0
+    latency_s_max: float = 0.0
+
+    @property
+    def key(self) -> tuple[int, str, str, str]:
+        return (self.hour, self.channel_id, self.user_id, self.model)
+
+    def merge(self, other: UsageBucket) -> None:
+        self.requests += other.requests
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.tool_calls += other.tool_calls
+        self.latency_s_sum += other.latency_s_sum
+        self.latency_s_max = max(self.latency_s_max, other.latency_s_max)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> UsageBucket:
+        return cls(**data)
+
+
+@dataclass
+class UsageSummary:
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tool_calls: int = 0
+    latency_s_sum: float = 0.0
+    latency_s_max: float = 0.0
+    by_model: dict[str, int] = field(default_factory=dict)
+    by_user: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def mean_latency_s(self) -> float | None:
+        return self.latency_s_sum / self.requests if self.requests else None
+
+    def add(self, bucket: UsageBucket) -> None:
+        tokens = bucket.prompt_tokens + bucket.completion_tokens
+        self.requests += bucket.requests
+        self.prompt_tokens += bucket.prompt_tokens
+        self.completion_tokens += bucket.completion_tokens
+        self.tool_calls += bucket.tool_calls
+        self.latency_s_sum += bucket.latency_s_sum
+        self.latency_s_max = max(self.latency_s_max, bucket.latency_s_max)
+        self.by_model[bucket.model] = self.by_model.get(bucket.model, 0) + tokens
+        self.by_user[bucket.user_id] = self.by_user.get(bucket.user_id, 0) + tokens
+
+
+class UsageLedger:
+    """Actual Mistral token usage in hourly buckets per channel, user and model.
+
+    Each flush appends one line of bucket deltas to a daily, append-only file
+    (encrypted like contexts). On startup the retained files are replayed into
+    in-memory rollups, so /usage queries never touch disk. Shard processes
+    sharing the directory each append to their own `partition` files and
+    replay everyone's.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        encryption_key: str | None,
+        retention_days: int = 30,
+        flush_interval_s: float = 60.0,
+        partition: str | None = None,
+    ):
+        self.directory = Path(directory)
+        self.partition = partition
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.encryption_key = encryption_key
+        self.retention_days = retention_days
+        self.flush_interval_s = flush_interval_s
+
+        self.buckets: dict[tuple[int, str, str, str], UsageBucket] = {}
+        self._pending: dict[tuple[int, str, str, str], UsageBucket] = {}
+        self._last_flush = time.monotonic()
+        self._load()
+
+    def _day_file(self, hour: int) -> Path:
+        day = time.strftime("%Y-%m-%d", time.gmtime(hour * _HOUR_S))
+        suffix = f".{self.partition}" if self.partition else ""
+        return self.directory / f"usage-{day}{suffix}.jsonl"
+
+    def _load(self) -> None:
+        cutoff = time.time() - self.retention_days * _DAY_S
+        for path in sorted(self.directory.glob("usage-*.jsonl")):
+            try:
+                day_start = calendar.timegm(time.strptime(path.name[6:16], "%Y-%m-%d"))
+            except ValueError:
+                continue
+            if day_start + _DAY_S < cutoff:
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                lines = path.read_bytes().splitlines()
+            except OSError as e:
+                print(f"Error reading usage ledger {path.name}: {e}")
+                continue
+            for line in lines:
+                try:
+                    for entry in self._decode_line(line):
+                        self._merge(self.buckets, UsageBucket.from_dict(entry))
+                except Exception as e:
+                    # A torn final line from a crash only loses that one flush
+                    print(f"Skipping unreadable usage ledger line in {path.name}: {e}")
+
+    def _decode_line(self, line: bytes) -> list[dict[str, Any]]:
+        line = line.strip()
+        if not line:
+            return []
+        if not line.startswith(b"["):
+            line = decrypt_json_bytes(base64.b64decode(line), self.encryption_key)
+        return json.loads(line.decode("utf-8"))
+
+    def _encode_line(self, buckets: list[UsageBucket]) -> bytes:
+        plain = json.dumps(
+            [bucket.to_dict() for bucket in buckets], separators=(",", ":")
+        ).encode("utf-8")
+        payload, envelope = encrypt_json_bytes(plain, self.encryption_key)
+        return (base64.b64encode(payload) if envelope else payload) + b"\n"
+
+    @staticmethod
+    def _merge(
+        target: dict[tuple[int, str, str, str], UsageBucket], bucket: UsageBucket
+    ) -> None:
+        existing = target.get(bucket.key)
+        if existing is None:
+            target[bucket.key] = UsageBucket(*bucket.key)
+            existing = target[bucket.key]
+        existing.merge(bucket)
+
+    def record(
+        self,
+        channel_id: str,
+        user_id: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency_s: float,
+        tool_calls: int = 0,
+    ) -> None:
+        bucket = UsageBucket(
+            hour=int(time.time() // _HOUR_S),
+            channel_id=str(channel_id),
+            user_id=str(user_id),
+            model=model,
+            requests=1,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            tool_calls=tool_calls,
+            latency_s_sum=latency_s,
+            latency_s_max=latency_s,
+        )
+        self._merge(self.buckets, bucket)
+        self._merge(self._pending, bucket)
+        if time.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        oldest_hour = int(time.time() // _HOUR_S) - self.retention_days * 24
+        for key in [key for key in self.buckets if key[0] < oldest_hour]:
+            del self.buckets[key]
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        by_file: dict[Path, list[UsageBucket]] = {}
+        for bucket in pending.values():
+            by_file.setdefault(self._day_file(bucket.hour), []).append(bucket)
+        for path, buckets in by_file.items():
+            try:
+                with open(path, "ab") as f:
+                    f.write(self._encode_line(buckets))
+            except OSError as e:
+                print(f"Error appending to usage ledger {path.name}: {e}")
+                for bucket in buckets:
+                    self._merge(self._pending, bucket)
+
+    def summarize(
+        self,
+        since_hours: int = 24,
+        channel_id: str | None = None,
+        user_id: str | None = None,
+    ) -> UsageSummary:
+        first_hour = int(time.time() // _HOUR_S) - since_hours + 1
+        summary = UsageSummary()
+        for bucket in self.buckets.values():
+            if bucket.hour < first_hour:
+                continue
+            if channel_id is not None and bucket.channel_id != channel_id:
+                continue
+            if user_id is not None and bucket.user_id != user_id:
+                continue
+            summary.add(bucket)
+        return summary
@@ -0,0 +1,7 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# Modules live flat in src/ and import each other by bare name, as bot.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", fake)
+    return fake
+
+
+def open_breaker(clock: FakeClock) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=2, window_s=30, open_s=10)
+    for _ in range(2):
+        breaker.record(False, breaker.before_call())
+    assert breaker.state == OPEN
+    return breaker
+
+
+def start_probe(breaker: CircuitBreaker, clock: FakeClock) -> int:
+    clock.now = breaker.opened_at + breaker.open_s
+    probe = breaker.before_call()
+    assert breaker.state == HALF_OPEN and probe is not None
+    return probe
+
+
+def test_opens_after_threshold_and_rejects_until_the_wait_ends(clock: FakeClock):
+    breaker = open_breaker(clock)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += breaker.open_s - 1
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_failures_below_the_ratio_keep_it_closed(clock: FakeClock):
+    breaker = CircuitBreaker("test", failure_threshold=2, failure_ratio=0.5)
+    for ok in (True, True, True, False, False):
+        breaker.record(ok, breaker.before_call())
+    assert breaker.state == CLOSED
+
+
+def test_successful_probe_closes(clock: FakeClock):
+    breaker = open_breaker(clock)
+    probe = start_probe(breaker, clock)
+    breaker.record(True, probe)
+    assert breaker.state == CLOSED
+    assert breaker.before_call() is None
+
+
+def test_failed_probe_reopens(clock: FakeClock):
+    breaker = open_breaker(clock)
+    probe = start_probe(breaker, clock)
+    breaker.record(False, probe)
+    assert breaker.state == OPEN
+    assert breaker.opened_at == clock.now
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_only_one_probe_at_a_time(clock: FakeClock):
+    breaker = open_breaker(clock)
+    start_probe(breaker, clock)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_cancelled_probe_neither_closes_nor_reopens(clock: FakeClock):
+    breaker = open_breaker(clock)
+    probe = start_probe(breaker, clock)
+    breaker.record(None, probe)
+    assert breaker.state == HALF_OPEN
+    # The slot is free again, so the next call becomes the probe
+    next_probe = breaker.before_call()
+    breaker.record(True, next_probe)
+    assert breaker.state == CLOSED
+
+
+def test_late_call_from_before_the_breaker_opened_cannot_decide(clock: FakeClock):
+    breaker = CircuitBreaker("test", failure_threshold=2, window_s=30, open_s=10)
+    late = breaker.before_call()
+    for _ in range(2):
+        breaker.record(False, breaker.before_call())
+    probe = start_probe(breaker, clock)
+
+    breaker.record(True, late)
+    assert breaker.state == HALF_OPEN
+    breaker.record(False, probe)
+    assert breaker.state == OPEN
+
+
+def test_stale_probe_token_is_ignored_in_a_later_half_open(clock: FakeClock):
+    breaker = open_breaker(clock)
+    stale = start_probe(breaker, clock)
+    breaker.record(False, stale)
+    probe = start_probe(breaker, clock)
+
+    breaker.record(None, stale)
+    breaker.record(True, stale)
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(True, probe)
+    assert breaker.state == CLOSED
+
+
+def test_cancelled_calls_do_not_count_while_closed(clock: FakeClock):
+    breaker = CircuitBreaker("test", failure_threshold=2, failure_ratio=0.5)
+    breaker.record(False, breaker.before_call())
+    for _ in range(5):
+        breaker.record(None, breaker.before_call())
+    assert breaker.state == CLOSED
+    breaker.record(False, breaker.before_call())
+    assert breaker.state == OPEN
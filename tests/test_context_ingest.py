@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import types
+from datetime import datetime, timedelta, timezone
+
+from context_manager import ContextManager
+
+_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def message(index: int) -> types.SimpleNamespace:
+    # Just the discord.Message attributes the context manager reads
+    return types.SimpleNamespace(
+        id=index,
+        content=f"message {index}",
+        created_at=_EPOCH + timedelta(seconds=index),
+        author=types.SimpleNamespace(id=1, display_name="alice", bot=False),
+    )
+
+
+def make_manager(tmp_path) -> ContextManager:
+    manager = ContextManager(tmp_path, encryption_key=None)
+    manager.ingest_delay = 0.01
+    manager.ingest_max_messages = 5
+    return manager
+
+
+def contents(context) -> list[str]:
+    return [msg.content for msg in context.messages]
+
+
+def expected(indexes) -> list[str]:
+    return [f"message {index}" for index in indexes]
+
+
+def assert_idle(manager: ContextManager) -> None:
+    assert manager._ingest_buffers == {}
+    assert manager._ingest_timers == {}
+    assert manager._ingest_tasks == {}
+
+
+async def settle(manager: ContextManager) -> None:
+    for _ in range(100):
+        await asyncio.sleep(manager.ingest_delay)
+        if not (manager._ingest_buffers or manager._ingest_tasks):
+            return
+
+
+def test_batches_apply_in_arrival_order(tmp_path):
+    async def scenario():
+        manager = make_manager(tmp_path)
+        for index in range(12):
+            manager.buffer_user_message("1", message(index))
+        await settle(manager)
+        assert_idle(manager)
+        context = await manager.get_conversation_context("1", False)
+        assert contents(context) == expected(range(12))
+        await manager.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_full_batch_is_capped_and_flushed_without_the_timer(tmp_path):
+    async def scenario():
+        manager = make_manager(tmp_path)
+        manager.ingest_delay = 60
+        for index in range(7):
+            manager.buffer_user_message("1", message(index))
+        await asyncio.sleep(0.05)
+        # The first full batch went out at once; the remainder waits for the timer
+        assert len(manager._ingest_buffers["1"]) == 2
+        assert "1" in manager._ingest_timers
+        context = manager.active_contexts.peek("1")
+        assert contents(context) == expected(range(5))
+        await manager.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_readers_and_direct_writes_see_buffered_messages_first(tmp_path):
+    async def scenario():
+        manager = make_manager(tmp_path)
+        manager.ingest_delay = 60
+        for index in range(3):
+            manager.buffer_user_message("1", message(index))
+        context = await manager.get_conversation_context("1", False)
+        assert contents(context) == expected(range(3))
+        assert_idle(manager)
+
+        manager.buffer_user_message("1", message(3))
+        await manager.add_user_message("1", message(4))
+        assert contents(context) == expected(range(5))
+        assert_idle(manager)
+        await manager.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    async def scenario():
+        manager = make_manager(tmp_path)
+        await asyncio.gather(
+            *(manager.add_user_message("1", message(index)) for index in range(20))
+        )
+        context = await manager.get_conversation_context("1", False)
+        assert contents(context) == expected(range(20))
+        assert manager.manifest.get("1").message_count == 20
+        await manager.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_clear_discards_a_pending_batch(tmp_path):
+    async def scenario():
+        manager = make_manager(tmp_path)
+        await manager.add_user_message("1", message(0))
+        for index in range(1, 4):
+            manager.buffer_user_message("1", message(index))
+        await manager.clear_conversation("1")
+        assert_idle(manager)
+        await asyncio.sleep(manager.ingest_delay * 3)
+
+        # Nothing may resurrect the channel once it is cleared
+        assert await manager.get_conversation_context("1", False) is None
+        assert not manager.is_known_channel("1")
+        assert not manager._get_context_file("1").exists()
+        await manager.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_truncate_applies_the_pending_batch_first(tmp_path):
+    async def scenario():
+        manager = make_manager(tmp_path)
+        manager.ingest_delay = 60
+        for index in range(5):
+            await manager.add_user_message("1", message(index))
+        for index in range(5, 7):
+            manager.buffer_user_message("1", message(index))
+
+        context = await manager.truncate_conversation("1", 3)
+        assert contents(context) == expected(range(4))
+        assert manager.manifest.get("1").message_count == 4
+        assert_idle(manager)
+        await manager.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_truncate_of_a_vanished_conversation_returns_none(tmp_path):
+    async def scenario():
+        manager = make_manager(tmp_path)
+        await manager.add_user_message("1", message(0))
+        # Clear queues for the channel lock first, as /amnesia racing a clear would
+        _, truncated = await asyncio.gather(
+            manager.clear_conversation("1"), manager.truncate_conversation("1", 1)
+        )
+        assert truncated is None
+        assert await manager.truncate_conversation("unknown", 1) is None
+        assert "unknown" not in manager.active_contexts
+        await manager.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_aclose_flushes_and_persists_everything(tmp_path):
+    async def scenario():
+        manager = make_manager(tmp_path)
+        manager.ingest_delay = 60
+        for channel in ("1", "2", "3"):
+            for index in range(7):
+                manager.buffer_user_message(channel, message(index))
+        await manager.aclose()
+        assert_idle(manager)
+        assert not manager._pending_saves
+        assert manager.dirty_channels == {}
+
+        reopened = make_manager(tmp_path)
+        for channel in ("1", "2", "3"):
+            context = await reopened.get_conversation_context(channel, False)
+            assert contents(context) == expected(range(7))
+            assert reopened.manifest.get(channel).message_count == 7
+        await reopened.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+
+import pytest
+from aiohttp import web
+
+import endpoint_pool
+from circuit_breaker import CircuitBreaker
+from endpoint_pool import Endpoint, EndpointPool
+from mistral_client import MistralClient
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    # Replaces the module's `time`, not time.monotonic itself, which asyncio uses
+    fake = FakeClock()
+    monkeypatch.setattr(endpoint_pool, "time", fake)
+    return fake
+
+
+def make_pool(*names: str, **kwargs) -> EndpointPool:
+    kwargs.setdefault("explore_rate", 0.0)
+    return EndpointPool([Endpoint(f"http://{name}", "key") for name in names], **kwargs)
+
+
+def request(pool: EndpointPool, ok: bool, latency_s: float = 0.1) -> str:
+    endpoint = pool.acquire()
+    pool.release(endpoint, latency_s, ok)
+    return endpoint.name
+
+
+def test_failure_counts_before_any_latency_is_measured():
+    pool = make_pool("a", "b")
+    assert request(pool, ok=False) == "a"
+    # Both unmeasured, but "a" has failed: it must not keep winning
+    assert [request(pool, ok=True) for _ in range(3)] == ["b", "b", "b"]
+
+
+def test_prefers_lower_latency_and_shorter_queue():
+    pool = make_pool("a", "b")
+    a, b = pool.endpoints
+    pool.release(pool.acquire(), 0.5, True)
+    pool.release(pool.acquire(), 0.1, True)
+    assert (a.ewma_latency_s, b.ewma_latency_s) == (0.5, 0.1)
+    assert pool.choose() is b
+
+    b.in_flight = 10
+    assert pool.choose() is a
+
+
+def test_ejection_cooldown_doubles_up_to_the_cap(clock: FakeClock):
+    pool = make_pool("a", "b", eject_after=2, eject_base_s=10, eject_max_s=25)
+    a, b = pool.endpoints
+    a.ewma_latency_s, b.ewma_latency_s = 0.1, 1.0
+
+    pool.release(pool.acquire(), 0.1, False)
+    assert not a.is_ejected(clock.now)
+    pool.release(pool.acquire(), 0.1, False)
+    assert a.ejected_until == clock.now + 10
+    assert pool.choose() is b
+
+    for cooldown in (20, 25):
+        clock.now = a.ejected_until
+        probe = pool.acquire()
+        assert probe is a and a.probing
+        # Only one probe at a time; everything else stays on "b"
+        assert pool.choose() is b
+        pool.release(probe, 0.1, False)
+        assert a.ejected_until == clock.now + cooldown
+
+
+def test_successful_probe_readmits_the_endpoint(clock: FakeClock):
+    pool = make_pool("a", "b", eject_after=1, eject_base_s=10)
+    a, b = pool.endpoints
+    a.ewma_latency_s, b.ewma_latency_s = 0.1, 1.0
+    pool.release(pool.acquire(), 0.1, False)
+    assert a.is_ejected(clock.now)
+
+    clock.now += 10
+    probe = pool.acquire()
+    assert probe is a
+    pool.release(probe, 0.1, True)
+    assert not a.probing and a.ejections == 0
+    assert pool.choose() is a
+
+
+def test_cancelled_probe_lets_the_next_request_probe(clock: FakeClock):
+    pool = make_pool("a", "b", eject_after=1, eject_base_s=10)
+    a, _ = pool.endpoints
+    pool.release(pool.acquire(), 0.1, False)
+    clock.now += 10
+    probe = pool.acquire()
+    pool.release(probe, 0.0, None)
+    assert a.ewma_latency_s is None and a.in_flight == 0
+    assert pool.acquire() is a and a.probing
+
+
+class StubMistral:
+    """Chat-completion endpoints on localhost; /<name>/ answers as configured."""
+
+    def __init__(self) -> None:
+        self.statuses: dict[str, int] = {}
+        self.hits: Counter[str] = Counter()
+        self.runner: web.AppRunner | None = None
+        self.port = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        self.hits[name] += 1
+        status = self.statuses.get(name, 200)
+        if status != 200:
+            return web.json_response({"message": "unavailable"}, status=status)
+        return web.json_response(
+            {
+                "choices": [{"message": {"role": "assistant", "content": "ok"}}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 1},
+            }
+        )
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.port}/{name}/v1/chat/completions"
+
+    async def __aenter__(self) -> StubMistral:
+        app = web.Application()
+        app.router.add_post("/{name}/v1/chat/completions", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.runner.cleanup()
+
+
+def test_client_routes_around_a_failing_endpoint_and_probes_it_back(
+    clock: FakeClock,
+):
+    async def scenario():
+        async with StubMistral() as stub:
+            client = MistralClient(api_key="key", api_url=stub.url("a"))
+            client.pool = EndpointPool(
+                [Endpoint(stub.url("a"), "key"), Endpoint(stub.url("b"), "key")],
+                eject_after=1,
+                eject_base_s=30,
+                explore_rate=0.0,
+            )
+            client.breaker = CircuitBreaker("stub", failure_threshold=100)
+            a, b = client.pool.endpoints
+            stub.statuses["a"] = 503
+
+            for _ in range(6):
+                try:
+                    await client.create_chat_completion(user_message="hi")
+                except RuntimeError:
+                    pass
+            assert stub.hits["a"] == 1 and a.is_ejected(clock.now)
+            assert stub.hits["b"] == 5
+
+            stub.statuses["a"] = 200
+            clock.now = a.ejected_until
+            await client.create_chat_completion(user_message="hi")
+            assert stub.hits["a"] == 2
+            assert a.ejections == 0 and not a.is_ejected(clock.now)
+
+    asyncio.run(scenario())
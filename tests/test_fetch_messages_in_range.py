@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import re
+
+import pytest
+
+from context_manager import ContextManager, ConversationContext, ConversationMessage
+from context_tools import ContextTools
+from tool_budget import ToolOutputBudgeter
+
+_START = 1_735_689_600.0  # 2025-01-01T00:00:00Z
+_ARGS = {"start": "2025-01-01T00:00:00Z", "end": "2025-01-01T02:00:00Z"}
+
+
+def build_context() -> ConversationContext:
+    context = ConversationContext("1", [], _START, _START)
+    messages = []
+    for index in range(120):
+        # Pairs share a timestamp, so the cursor has to break ties by id
+        messages.append(
+            ConversationMessage(
+                id=str(index),
+                author_id=str(index % 3),
+                author_name=f"user{index % 3}",
+                content=f"message {index} " + "padding " * (index % 7),
+                timestamp=_START + (index // 2) * 60,
+                role="assistant" if index % 5 == 0 else "user",
+                is_bot=index % 5 == 0,
+            )
+        )
+    context.add_messages(messages)
+    return context
+
+
+def shown_ids(text: str) -> list[int]:
+    return [int(match) for match in re.findall(r"message (\d+)", text)]
+
+
+async def walk(tools: ContextTools, arguments: dict) -> tuple[list[int], int]:
+    seen, pages = [], 0
+    arguments = dict(arguments)
+    while True:
+        text, cursor = await tools.execute_tool(
+            "fetch_messages_in_range", "1", arguments
+        )
+        pages += 1
+        ids = shown_ids(text)
+        assert f"({len(ids)} message" in text
+        seen += ids
+        if cursor is None:
+            assert "End of range." in text
+            return seen, pages
+        assert f'cursor "{cursor}"' in text
+        arguments["cursor"] = cursor
+
+
+@pytest.mark.parametrize("include_bots", [True, False])
+def test_cursor_walk_returns_every_message_exactly_once(tmp_path, include_bots):
+    async def scenario():
+        manager = ContextManager(tmp_path, encryption_key=None)
+        context = build_context()
+        manager.active_contexts.put("1", context)
+        tools = ContextTools(manager)
+        # A tight budget forces pages shorter than `limit`
+        tools.budgeter = ToolOutputBudgeter(150, 200, manager._estimate_tokens)
+
+        seen, pages = await walk(
+            tools, {**_ARGS, "limit": 7, "include_bot_messages": include_bots}
+        )
+        expected = [
+            int(msg.id)
+            for msg in context.messages
+            if _START <= msg.timestamp < _START + 7200
+            and (include_bots or not msg.is_bot)
+        ]
+        assert seen == expected
+        assert len(set(seen)) == len(seen)
+        assert pages > len(expected) // 7
+        await manager.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_shown_count_excludes_filtered_bot_messages(tmp_path):
+    async def scenario():
+        manager = ContextManager(tmp_path, encryption_key=None)
+        manager.active_contexts.put("1", build_context())
+        tools = ContextTools(manager)
+        text, _ = await tools.execute_tool(
+            "fetch_messages_in_range",
+            "1",
+            {**_ARGS, "end": "2025-01-01T00:05:00Z", "include_bot_messages": False},
+        )
+        # Minutes 0-4 hold messages 0-9; 0 and 5 are from the bot
+        assert shown_ids(text) == [1, 2, 3, 4, 6, 7, 8, 9]
+        assert "(8 messages shown. End of range.)" in text
+        await manager.aclose()
+
+    asyncio.run(scenario())
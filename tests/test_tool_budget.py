@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from context_manager import ConversationMessage
+from tool_budget import ToolOutputBudgeter
+
+_FORMAT = "%H:%M"
+
+
+def message(
+    index: int, content: str, author: str = "alice", author_id: str = "1"
+) -> ConversationMessage:
+    return ConversationMessage(
+        id=str(index),
+        author_id=author_id,
+        author_name=author,
+        content=content,
+        timestamp=1_700_000_000 + index * 60,
+        role="user",
+        is_bot=False,
+    )
+
+
+def budgeter(token_budget: int, max_message_chars: int = 200) -> ToolOutputBudgeter:
+    # One token per character keeps the arithmetic in the tests exact
+    return ToolOutputBudgeter(token_budget, max_message_chars, len)
+
+
+def test_longest_fitting_finds_the_largest_count_within_budget():
+    tools = budgeter(255)
+    assert tools._longest_fitting(lambda count: "x" * (count * 10), 100) == 25
+    assert tools._longest_fitting(lambda count: "x" * (count * 10), 20) == 20
+    assert tools._longest_fitting(lambda count: "", 0) == 0
+    # At least one item is always kept; clip() then enforces the budget
+    assert tools._longest_fitting(lambda count: "x" * 1000, 5) == 1
+
+
+def test_trimming_keeps_the_newest_messages_and_says_how_many_went():
+    messages = [
+        message(index, f"note {index}", author=f"user{index}") for index in range(20)
+    ]
+    text = budgeter(200).render_messages("test", "Header:\n", messages, _FORMAT)
+    assert len(text) <= 200
+    assert text.startswith("Header:\n(")
+    assert "note 19" in text and "note 0" not in text
+    kept = len(text.splitlines()) - 2
+    assert text.endswith("note 19")
+    assert f"({20 - kept} older messages omitted" in text
+
+
+def test_duplicates_differing_in_case_punctuation_and_spacing_collapse():
+    messages = [
+        message(0, "Hello, World!", author="a", author_id="1"),
+        message(1, "something else", author="b", author_id="2"),
+        message(2, "hello   world", author="c", author_id="3"),
+        message(3, "HELLO world.", author="d", author_id="4"),
+    ]
+    text = budgeter(1000).render_messages("test", "", messages, _FORMAT)
+    lines = text.splitlines()
+    # The newest copy survives and carries the count
+    assert len(lines) == 2
+    assert lines[0].endswith("b: something else")
+    assert lines[1].endswith("d: HELLO world. (x3)")
+
+
+def test_consecutive_messages_by_one_author_share_a_prefix():
+    messages = [
+        message(0, "first"),
+        message(1, "second"),
+        message(2, "reply", author="bob", author_id="2"),
+        message(3, "third"),
+        # Same author id, but a different label (e.g. another channel)
+        message(4, "elsewhere", author="alice in #random"),
+    ]
+    text = budgeter(1000).render_messages("test", "", messages, _FORMAT)
+    lines = text.splitlines()
+    assert len(lines) == 4
+    assert lines[0].endswith("alice: first / second")
+    assert lines[2].endswith("alice: third")
+    assert lines[3].endswith("alice in #random: elsewhere")
+
+
+def test_long_messages_are_shortened_on_a_word_boundary():
+    content = "word " * 100
+    text = budgeter(1000, max_message_chars=50).render_messages(
+        "test", "", [message(0, content)], _FORMAT
+    )
+    body = text.split(": ", 1)[1]
+    assert len(body) <= 50 and body.endswith("word…")
+
+
+def test_single_message_larger_than_the_budget_is_clipped():
+    tools = budgeter(100, max_message_chars=10_000)
+    huge = message(0, "x" * 5000)
+    text = tools.render_messages("test", "Header:\n", [huge], _FORMAT)
+    assert len(text) <= 100
+    assert text.startswith("Header:\n") and text.endswith("…")
+
+
+def test_page_keeps_its_footer_when_the_first_message_overflows():
+    tools = budgeter(100, max_message_chars=10_000)
+    messages = [message(0, "x" * 5000), message(1, "small")]
+
+    def footer(count: int) -> str:
+        return f"\n(cursor {count})"
+
+    text, count = tools.render_page("test", "Header:\n", messages, _FORMAT, footer)
+    assert count == 1
+    assert text.endswith("\n(cursor 1)")
+    assert len(text) <= 100
+
+
+def test_page_covers_a_prefix_in_order():
+    tools = budgeter(120)
+    messages = [
+        message(index, f"item {index}", author=f"u{index}") for index in range(10)
+    ]
+    text, count = tools.render_page(
+        "test", "", messages, _FORMAT, lambda count: f"\n(next {count})"
+    )
+    assert 0 < count < 10
+    assert all(f"item {index}" in text for index in range(count))
+    assert f"item {count}" not in text
+    assert len(text) <= 120